@@ -0,0 +1,175 @@
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from flask import current_app
+from sqlalchemy.orm import load_only
+from models import ParkingLot, CacheVersion
+
+SUGGESTIONS_VERSION = 'lot_suggestions'
+DEFAULT_CHECK_SECONDS = 2
+TOKEN_SPLIT = re.compile(r'[^0-9a-z]+')
+
+class LotSuggestions:
+    """In-memory prefix index over lot names, name/address tokens and pin codes.
+
+    Keys live in one sorted list of (key, lot_id) pairs, so a prefix lookup is a bisect
+    plus a short forward scan and never touches the database. The index is loaded on first
+    use; after that the worker that creates, edits or deletes a lot updates its own index
+    through `put()` and `remove()`, and bumps the `lot_suggestions` CacheVersion for the
+    others. Each worker checks that version in a background thread at most every
+    `check_seconds` and applies what changed with `sync()`, without re-sorting the index.
+    """
+    DEFAULT_LIMIT = 8
+
+    def __init__(self, check_seconds=DEFAULT_CHECK_SECONDS):
+        self.check_seconds = check_seconds
+        self._entries = []
+        self._keys_by_lot = {}
+        self._lots = {}
+        self._lock = threading.Lock()
+        self.version = None
+        self._checked_at = 0.0
+        self._checking = False
+
+    @staticmethod
+    def _keys(lot):
+        name = lot.name.lower()
+        keys = {name, lot.pin_code}
+        keys.update(TOKEN_SPLIT.split(name))
+        keys.update(TOKEN_SPLIT.split(lot.address.lower()))
+        keys.discard('')
+        return keys
+
+    @staticmethod
+    def _record(lot):
+        return {'id': lot.id, 'name': lot.name, 'address': lot.address, 'pin_code': lot.pin_code}
+
+    def _remove_locked(self, lot_id):
+        for key in self._keys_by_lot.pop(lot_id, ()):
+            i = bisect_left(self._entries, (key, lot_id))
+            if i < len(self._entries) and self._entries[i] == (key, lot_id):
+                del self._entries[i]
+        self._lots.pop(lot_id, None)
+
+    def _track(self, lot):
+        keys = self._keys(lot)
+        self._keys_by_lot[lot.id] = keys
+        self._lots[lot.id] = self._record(lot)
+        return keys
+
+    def _put_locked(self, lot):
+        self._remove_locked(lot.id)
+        for key in self._track(lot):
+            insort(self._entries, (key, lot.id))
+
+    def load(self, lots, version):
+        with self._lock:
+            if self.version is not None and version <= self.version:
+                return
+            self._keys_by_lot, self._lots = {}, {}
+            self._entries = sorted((key, lot.id) for lot in lots for key in self._track(lot))
+            self.version = version
+            self._checked_at = time.monotonic()
+
+    def sync(self, lots, version):
+        """Brings a loaded index up to `lots` (every lot, read at `version`) one lot at a time."""
+        with self._lock:
+            if self.version is not None and version <= self.version:
+                return
+            seen = set()
+            for lot in lots:
+                seen.add(lot.id)
+                if self._lots.get(lot.id) != self._record(lot):
+                    self._put_locked(lot)
+            for lot_id in self._lots.keys() - seen:
+                self._remove_locked(lot_id)
+            self.version = version
+
+    def put(self, lot):
+        """Adds or refreshes a lot after it was created or edited."""
+        with self._lock:
+            if self.version is not None:
+                self._put_locked(lot)
+
+    def remove(self, lot_id):
+        with self._lock:
+            if self.version is not None:
+                self._remove_locked(lot_id)
+
+    def check_due(self):
+        """True (once) when a version check is due and none is running; pair with `checked()`."""
+        with self._lock:
+            if self._checking or time.monotonic() - self._checked_at < self.check_seconds:
+                return False
+            self._checking = True
+            return True
+
+    def checked(self):
+        with self._lock:
+            self._checked_at = time.monotonic()
+            self._checking = False
+
+    def suggest(self, prefix, limit=DEFAULT_LIMIT):
+        """Lots with any key starting with `prefix`, in key order, at most `limit`."""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        suggestions, seen = [], set()
+        with self._lock:
+            entries = self._entries
+            i = bisect_left(entries, (prefix,))
+            while i < len(entries) and len(suggestions) < limit:
+                key, lot_id = entries[i]
+                if not key.startswith(prefix):
+                    break
+                if lot_id not in seen:
+                    seen.add(lot_id)
+                    suggestions.append(self._lots[lot_id])
+                i += 1
+        return suggestions
+
+def make_lot_suggestions(config):
+    return LotSuggestions(config.get('LOT_SUGGESTIONS_CHECK_SECONDS', DEFAULT_CHECK_SECONDS))
+
+def bump_lot_suggestions():
+    """Call in the same transaction as creating, editing or deleting a lot."""
+    CacheVersion.bump(SUGGESTIONS_VERSION)
+
+def index_lot(lot):
+    """Call after a lot is created or edited (and its transaction committed)."""
+    current_app.extensions['lot_suggestions'].put(lot)
+
+def unindex_lot(lot_id):
+    """Call after a lot is deleted (and its transaction committed)."""
+    current_app.extensions['lot_suggestions'].remove(lot_id)
+
+def _all_lots():
+    return ParkingLot.query.options(
+        load_only(ParkingLot.id, ParkingLot.name, ParkingLot.address, ParkingLot.pin_code)
+    ).all()
+
+def _refresh(app, index):
+    """Syncs `index` with the database if another worker changed a lot; runs off the request."""
+    try:
+        with app.app_context():
+            # version first, as in AvailabilityCache.snapshot: a change landing before the
+            # read only makes the index newer than its tag
+            version = CacheVersion.current(SUGGESTIONS_VERSION)
+            if version != index.version:
+                index.sync(_all_lots(), version)
+    except Exception:
+        app.logger.exception('Refreshing the lot suggestions failed')
+    finally:
+        index.checked()
+
+def lot_suggestions():
+    """The app's lot prefix index, loaded from the database on first use."""
+    index = current_app.extensions['lot_suggestions']
+    if index.version is None:
+        version = CacheVersion.current(SUGGESTIONS_VERSION)
+        index.load(_all_lots(), version)
+    elif index.check_due():
+        app = current_app._get_current_object()
+        threading.Thread(target=_refresh, args=(app, index), name='lot-suggestions', daemon=True).start()
+    return index
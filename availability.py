@@ -0,0 +1,57 @@
+import threading
+from collections import namedtuple
+from flask import current_app
+from cache import get_cache
+from models import db, ParkingLot, CacheVersion
+
+AVAILABILITY_VERSION = 'lot_availability'
+
+LotAvailability = namedtuple('LotAvailability', [
+    'id', 'name', 'address', 'pin_code', 'price_per_hour', 'maximum_capacity', 'is_active',
+    'available_spots', 'reserved_spots', 'occupied_spots',
+])
+
+class AvailabilityCache:
+    """Snapshot of every lot's availability, keyed by lot id in name order.
+
+    The snapshot is tagged with the `lot_availability` CacheVersion it was read at. Every write
+    that changes a lot's counters, price or listing bumps that version, so a reader only pays a
+    primary-key lookup while nothing changed. After a write, the first worker to notice loads the
+    lots once and shares them through the app cache under the new version; the rest pick it up
+    from there.
+    """
+
+    def __init__(self):
+        self.version = None
+        self._lots = {}
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        """{lot_id: LotAvailability}; treat as read-only."""
+        # Read the version before the lots: a write landing in between only makes the
+        # snapshot newer than its tag, and the next read refreshes it again.
+        version = CacheVersion.current(AVAILABILITY_VERSION)
+        if version == self.version:
+            return self._lots
+
+        key = f'{AVAILABILITY_VERSION}:{version}'
+        lots = get_cache().get(key)
+        if lots is None:
+            rows = db.session.execute(
+                db.select(*(getattr(ParkingLot, field) for field in LotAvailability._fields))
+                .order_by(ParkingLot.name)
+            ).all()
+            lots = {row.id: LotAvailability(*row) for row in rows}
+            get_cache().set(key, lots)
+        with self._lock:
+            if self.version is None or version > self.version:
+                self._lots, self.version = lots, version
+        return lots
+
+def lot_availability():
+    """The current availability snapshot for this process."""
+    return current_app.extensions['lot_availability'].snapshot()
+
+def bump_availability():
+    """Call in the same transaction as any change to a lot's counters, price or listing."""
+    CacheVersion.bump(AVAILABILITY_VERSION)
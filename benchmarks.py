@@ -0,0 +1,427 @@
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from sqlalchemy import create_engine, event, func, insert, select, update
+from sqlalchemy.exc import OperationalError
+from engine_profile import apply_sqlite_pragmas
+from models import db, ParkingLot, ParkingSpot, Reservation, User
+
+def sqlite_concurrency(pragmas, seconds=5.0, readers=4, writers=2, spots=500, history=5000, seed=1):
+    """Read/write throughput of a throwaway SQLite database opened with `pragmas`.
+
+    Readers run the user dashboard's lot listing plus a reservation history page; writers
+    each run booking-style transactions (flip a spot, adjust the lot counters, insert a
+    reservation). Returns ops/s for each side and how many operations failed on a lock.
+    """
+    path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    engine = create_engine(f'sqlite:///{path}')
+    apply_sqlite_pragmas(engine, pragmas)
+    db.metadata.create_all(engine)
+    rng = random.Random(seed)
+
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {'username': f'bench{i}', 'full_name': f'Bench {i}', 'email': f'bench{i}@example.com', 'password_hash': '!'}
+            for i in range(1, 51)
+        ])
+        conn.execute(insert(ParkingLot), [{
+            'name': 'Bench Lot', 'address': 'Bench Road', 'pin_code': '000000', 'price_per_hour': 10.0,
+            'maximum_capacity': spots, 'is_active': True, 'available_spots': spots,
+            'reserved_spots': 0, 'occupied_spots': 0,
+        }])
+        conn.execute(insert(ParkingSpot), [
+            {'lot_id': 1, 'spot_index': i, 'spot_number': ParkingSpot.format_spot_number(i), 'status': 'Available'}
+            for i in range(1, spots + 1)
+        ])
+        conn.execute(insert(Reservation), [{
+            'spot_id': rng.randint(1, spots), 'user_id': rng.randint(1, 50), 'vehicle_number': f'BN{i:05d}',
+            'booking_timestamp': datetime(2025, 1, 1), 'status': 'completed', 'total_cost': 10.0,
+        } for i in range(history)])
+
+    counts = {'reads': 0, 'writes': 0, 'read_errors': 0, 'write_errors': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def tally(name):
+        with lock:
+            counts[name] += 1
+
+    def read_loop(n):
+        local = random.Random(seed + n)
+        while time.monotonic() < deadline:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(select(ParkingLot).order_by(ParkingLot.name)).all()
+                    conn.execute(select(Reservation).where(Reservation.user_id == local.randint(1, 50))
+                                 .order_by(Reservation.booking_timestamp.desc()).limit(50)).all()
+                tally('reads')
+            except OperationalError:
+                tally('read_errors')
+
+    def write_loop(n):
+        local = random.Random(seed + 100 + n)
+        while time.monotonic() < deadline:
+            spot_id = local.randint(1, spots)
+            try:
+                with engine.begin() as conn:
+                    status = conn.execute(select(ParkingSpot.status).where(ParkingSpot.id == spot_id)).scalar()
+                    new_status = 'Occupied' if status == 'Available' else 'Available'
+                    conn.execute(update(ParkingSpot).where(ParkingSpot.id == spot_id).values(status=new_status))
+                    conn.execute(update(ParkingLot).where(ParkingLot.id == 1).values(
+                        available_spots=ParkingLot.available_spots + (-1 if new_status == 'Occupied' else 1)))
+                    conn.execute(insert(Reservation).values(
+                        spot_id=spot_id, user_id=local.randint(1, 50), vehicle_number='BW', status='active',
+                        booking_timestamp=func.current_timestamp()))
+                tally('writes')
+            except OperationalError:
+                tally('write_errors')
+
+    threads = [threading.Thread(target=read_loop, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=write_loop, args=(i,)) for i in range(writers)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - started
+    engine.dispose()
+
+    return {
+        'reads_per_s': round(counts['reads'] / elapsed, 1),
+        'writes_per_s': round(counts['writes'] / elapsed, 1),
+        'read_errors': counts['read_errors'],
+        'write_errors': counts['write_errors'],
+    }
+
+def spot_provisioning(app, spots=10000, runs=3):
+    """Median ms to provision and remove a `spots`-spot lot in `app`'s (scratch) database.
+
+    `bulk_create` and `bulk_delete_free` are the paths create_parking_lot and a capacity
+    reduction in edit_parking_lot take; `orm_create` / `orm_delete` do the same one ParkingSpot
+    object at a time, as those routes used to, for comparison. Each step commits.
+    """
+    timings = {'bulk_create': [], 'bulk_delete_free': [], 'orm_create': [], 'orm_delete': []}
+
+    def timed(name, step):
+        started = time.perf_counter()
+        step()
+        db.session.commit()
+        timings[name].append((time.perf_counter() - started) * 1000)
+
+    with app.app_context():
+        for run in range(runs):
+            lot = ParkingLot(name=f'Provisioning Lot {run}', address='Bench Road', pin_code=f'{980000 + run}',
+                             price_per_hour=10.0, maximum_capacity=spots, available_spots=spots)
+            db.session.add(lot)
+            db.session.commit()
+
+            timed('bulk_create', lambda: ParkingSpot.bulk_create(lot.id, 1, spots))
+            timed('bulk_delete_free', lambda: ParkingSpot.bulk_delete_free(lot.id, spots))
+
+            def orm_create():
+                for i in range(1, spots + 1):
+                    db.session.add(ParkingSpot(lot_id=lot.id, spot_index=i, status='Available',
+                                               spot_number=ParkingSpot.format_spot_number(i)))
+            timed('orm_create', orm_create)
+
+            def orm_delete():
+                for spot in ParkingSpot.query.filter(
+                    ParkingSpot.lot_id == lot.id,
+                    ParkingSpot.status == 'Available',
+                    ~ParkingSpot.spot_reservations.any(Reservation.is_open())
+                ).order_by(ParkingSpot.spot_index.desc()).limit(spots).all():
+                    db.session.delete(spot)
+            timed('orm_delete', orm_delete)
+
+            db.session.delete(lot)
+            db.session.commit()
+
+    return {name: round(_percentile(values, 0.5), 1) for name, values in timings.items()}
+
+def login_throughput(app, clients=16, logins=128, password='password123'):
+    """Throughput of `logins` sign-ins posted by `clients` concurrent threads to `app`'s (scratch) database.
+
+    Every thread logs in as the same user through its own test client, so the cost is the
+    PasswordHasher pool (PASSWORD_HASH_METHOD / _WORKERS / _TIMEOUT) plus the login view.
+    A probe requests the home page throughout to show what a burst does to other pages.
+    """
+    with app.app_context():
+        if User.query.filter_by(username='bench_login').first() is None:
+            user = User(username='bench_login', full_name='Bench Login', email='bench_login@example.com')
+            user.set_password(password)
+            db.session.add(user)
+            db.session.commit()
+
+    latencies, statuses, probe_ms = [], Counter(), []
+    lock = threading.Lock()
+    done = threading.Event()
+    start = threading.Barrier(clients + 2)  # login threads, the probe and this thread
+
+    def login_loop(count):
+        client = app.test_client()
+        start.wait()
+        for _ in range(count):
+            started = time.perf_counter()
+            status = client.post('/auth/login', data={'username': 'bench_login', 'password': password}).status_code
+            elapsed = (time.perf_counter() - started) * 1000
+            client.get('/auth/logout')
+            with lock:
+                latencies.append(elapsed)
+                statuses[status] += 1
+
+    def probe():
+        client = app.test_client()
+        start.wait()
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get('/')
+            probe_ms.append((time.perf_counter() - started) * 1000)
+            done.wait(0.01)
+
+    threads = [threading.Thread(target=login_loop, args=(logins // clients + (i < logins % clients),))
+               for i in range(clients)]
+    prober = threading.Thread(target=probe)
+    for thread in threads + [prober]:
+        thread.start()
+    started = time.perf_counter()
+    start.wait()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    prober.join()
+
+    return {
+        'logins_per_s': round(statuses[302] / elapsed, 1),
+        'p50_ms': round(_percentile(latencies, 0.50), 1),
+        'p95_ms': round(_percentile(latencies, 0.95), 1),
+        'busy': statuses[503],
+        'errors': sum(count for status, count in statuses.items() if status not in (302, 503)),
+        'other_page_p50_ms': round(_percentile(probe_ms, 0.50), 1) if probe_ms else None,
+        'other_page_max_ms': round(max(probe_ms), 1) if probe_ms else None,
+    }
+
+def _percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def query_origin(root_path):
+    """Where the statement being executed was issued: the innermost Jinja template line if a
+    template is rendering (`admin/list_users.html:29`), else the innermost app source line."""
+    frame = sys._getframe(1)
+    app_line = None
+    while frame is not None:
+        template = frame.f_globals.get('__jinja_template__')
+        if template is not None:
+            return f'{template.name}:{template.get_corresponding_lineno(frame.f_lineno)}'
+        filename = frame.f_code.co_filename
+        if (app_line is None and filename.startswith(root_path) and 'site-packages' not in filename
+                and filename != __file__):
+            app_line = f'{os.path.relpath(filename, root_path)}:{frame.f_lineno}'
+        frame = frame.f_back
+    return app_line or '?'
+
+class RouteBenchmark:
+    """Drives every admin and user route through the Flask test client against the app's database.
+
+    Read-only pages are requested as they are; state-changing routes run as round trips that
+    leave the data as they found it (book -> check in -> park out, book -> cancel, create ->
+    edit -> delete a lot). Completed reservations from those round trips do accumulate.
+    With `capture`, each route also keeps the statements (and where they came from, see
+    query_origin) of its request that ran the most of them.
+    """
+
+    def __init__(self, app, admin_username, username, password, capture=False):
+        self.app = app
+        self.admin_username = admin_username
+        self.username = username
+        self.password = password
+        self.capture = capture
+        self.samples = {}
+        self._queries = 0
+        self._statements = []
+        self._thread_id = None
+
+    def _count_query(self, conn, cursor, statement, *args):
+        # the test client serves requests on this thread; background refreshes don't count
+        if threading.get_ident() != self._thread_id:
+            return
+        self._queries += 1
+        if self.capture:
+            self._statements.append((statement, query_origin(self.app.root_path)))
+
+    def _login(self, username):
+        client = self.app.test_client()
+        response = client.post('/auth/login', data={'username': username, 'password': self.password})
+        if response.status_code != 302 or 'login' in response.headers.get('Location', ''):
+            raise ValueError(f"Could not log in as '{username}'.")
+        return client
+
+    def _request(self, label, client, method, path, data=None, expect=(200, 302)):
+        self._queries = 0
+        self._statements = []
+        started = time.perf_counter()
+        response = client.open(path, method=method, data=data)
+        elapsed = (time.perf_counter() - started) * 1000
+        sample = self.samples.setdefault(label, {'ms': [], 'queries': [], 'errors': 0, 'statements': []})
+        if self._queries >= max(sample['queries'], default=0):
+            sample['statements'] = self._statements
+        sample['ms'].append(elapsed)
+        sample['queries'].append(self._queries)
+        if response.status_code not in expect:
+            sample['errors'] += 1
+        return response
+
+    def _scalar(self, stmt):
+        # a short app context of its own; requests must not share one (or its session)
+        with self.app.app_context():
+            return db.session.execute(stmt).scalar()
+
+    def _fixtures(self):
+        """Ids the parameterised routes need: a large lot, a spot with history, the bench users."""
+        with self.app.app_context():
+            user = User.query.filter_by(username=self.username).one()
+            if Reservation.query.filter(Reservation.user_id == user.id, Reservation.is_open()).first():
+                raise ValueError(f"'{self.username}' has an open reservation; pick a user without one.")
+            lot = ParkingLot.query.filter(ParkingLot.available_spots > 0).order_by(
+                ParkingLot.maximum_capacity.desc(), ParkingLot.id).first()
+            if lot is None:
+                raise ValueError('No parking lot has a free spot to book.')
+            spot_id = db.session.execute(
+                select(Reservation.spot_id).join(ParkingSpot).where(ParkingSpot.lot_id == lot.id)
+                .order_by(Reservation.id).limit(1)
+            ).scalar() or ParkingSpot.query.filter_by(lot_id=lot.id).first().id
+            return {'user_id': user.id, 'username': user.username, 'email': user.email,
+                    'full_name': user.full_name, 'lot_id': lot.id, 'lot_name': lot.name, 'pin_code': lot.pin_code,
+                    'spot_id': spot_id}
+
+    def _latest_reservation(self, user_id):
+        return self._scalar(select(Reservation.id).where(Reservation.user_id == user_id)
+                            .order_by(Reservation.id.desc()).limit(1))
+
+    def run(self, runs=20):
+        self._thread_id = threading.get_ident()
+        fixtures = self._fixtures()
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', self._count_query)
+        try:
+            admin, user = self._login(self.admin_username), self._login(self.username)
+            for run in range(runs):
+                self._run_once(admin, user, fixtures, run)
+        finally:
+            event.remove(engine, 'before_cursor_execute', self._count_query)
+        return self.results()
+
+    def _run_once(self, admin, user, fixtures, run):
+        lot_id = fixtures['lot_id']
+        term = fixtures['lot_name'][:6]
+
+        for label, path in (
+            ('admin.dashboard', '/admin/dashboard'),
+            ('admin.dashboard ?days=90', '/admin/dashboard?days=90'),
+            ('admin.sql_stats', '/admin/sql_stats'),
+            ('admin.list_profiles', '/admin/profiles'),
+            ('admin.list_parking_lots', '/admin/parking_lots'),
+            ('admin.search lots', f'/admin/search?search_term={term}&search_category=lots'),
+            ('admin.search users', f'/admin/search?search_term={self.username[:6]}&search_category=users'),
+            ('admin.search pincode', f"/admin/search?search_term={fixtures['pin_code'][:3]}&search_category=pincode"),
+            ('admin.search all users', '/admin/search?search_term=&search_category=users'),
+            ('admin.create_parking_lot GET', '/admin/parking_lot/new'),
+            ('admin.edit_parking_lot GET', f'/admin/parking_lot/edit/{lot_id}'),
+            ('admin.view_lot_spots', f'/admin/view_spots/{lot_id}'),
+            ('admin.view_spot_details', f"/admin/view_spot_details/{fixtures['spot_id']}"),
+            ('admin.list_users', '/admin/users'),
+            ('admin.user_details', f"/admin/user_details/{fixtures['user_id']}"),
+        ):
+            self._request(label, admin, 'GET', path)
+
+        for label, path in (
+            ('user.dashboard', '/user/dashboard'),
+            ('user.dashboard search', f'/user/dashboard?search_term={term}'),
+            ('user.autocomplete', f'/user/autocomplete?q={term[:3]}'),
+            ('user.book_spot GET', f'/user/book_spot/{lot_id}'),
+            ('user.edit_profile GET', '/user/edit_profile'),
+            ('user.change_password GET', '/user/change_password'),
+        ):
+            self._request(label, user, 'GET', path)
+
+        vehicle = f'BENCH{run:05d}'
+        self._request('user.book_spot POST', user, 'POST', f'/user/book_spot/{lot_id}', {'vehicle_number': vehicle})
+        reservation_id = self._latest_reservation(fixtures['user_id'])
+        self._request('user.check_in_reservation', user, 'POST', f'/user/check_in_reservation/{reservation_id}')
+        self._request('user.park_out_page', user, 'GET', f'/user/park_out_page/{reservation_id}')
+        self._request('user.park_out_action', user, 'POST', f'/user/park_out_action/{reservation_id}')
+        self._request('user.book_spot POST', user, 'POST', f'/user/book_spot/{lot_id}', {'vehicle_number': vehicle + 'C'})
+        reservation_id = self._latest_reservation(fixtures['user_id'])
+        self._request('user.cancel_reservation', user, 'POST', f'/user/cancel_reservation/{reservation_id}')
+
+        self._request('user.edit_profile POST', user, 'POST', '/user/edit_profile',
+                      {'username': fixtures['username'], 'email': fixtures['email'], 'full_name': fixtures['full_name']})
+        self._request('user.change_password POST', user, 'POST', '/user/change_password',
+                      {'current_password': self.password, 'new_password': self.password,
+                       'confirm_new_password': self.password})
+
+        name, pin_code = f'Bench Lot {run:05d}', f'{990000 + run}'
+        lot_form = {'name': name, 'address': 'Bench Road', 'pin_code': pin_code, 'price_per_hour': 10, 'maximum_capacity': 10}
+        self._request('admin.create_parking_lot POST', admin, 'POST', '/admin/parking_lot/new', lot_form)
+        new_lot_id = self._scalar(select(ParkingLot.id).where(ParkingLot.name == name))
+        self._request('admin.edit_parking_lot POST', admin, 'POST', f'/admin/parking_lot/edit/{new_lot_id}',
+                      dict(lot_form, maximum_capacity=12))
+        spot_id = self._scalar(select(ParkingSpot.id).where(ParkingSpot.lot_id == new_lot_id).limit(1))
+        self._request('admin.delete_spot', admin, 'POST', f'/admin/spot/delete/{spot_id}')
+        self._request('admin.delete_parking_lot', admin, 'POST', f'/admin/parking_lot/delete/{new_lot_id}')
+
+    def results(self):
+        return {
+            label: {
+                'runs': len(sample['ms']),
+                'p50_ms': round(_percentile(sample['ms'], 0.50), 2),
+                'p95_ms': round(_percentile(sample['ms'], 0.95), 2),
+                'queries': max(sample['queries']),
+                'errors': sample['errors'],
+            }
+            for label, sample in self.samples.items()
+        }
+
+# Only the large dataset has more than one page (50 rows) of users, lots and one user's
+# reservations, so a query issued once per row makes a route's statement count differ
+QUERY_BUDGET_DATASETS = (
+    ('small', dict(lots=4, users=10, reservations=150, min_capacity=5, max_capacity=20)),
+    ('large', dict(lots=60, users=120, reservations=9000, min_capacity=30, max_capacity=80)),
+)
+
+def query_budget_run(app, dataset, password='password123'):
+    """Seeds `app`'s empty database with a synthetic `dataset` and requests every route once.
+
+    Returns {route: (statements, errors, [(statement, origin), ...])}.
+    """
+    from synthetic_data import generate
+    with app.app_context():
+        generate(password=password, end=datetime(2026, 1, 1), **dataset)
+        db.session.commit()
+    bench = RouteBenchmark(app, 'synth_admin', 'synth_user000001', password, capture=True)
+    bench.run(1)
+    return {label: (sample['queries'][0], sample['errors'], sample['statements'])
+            for label, sample in bench.samples.items()}
+
+def query_budget_regressions(small, large):
+    """Routes whose statement count differs between a small and a large query_budget_run.
+
+    Yields (route, small count, large count, offending) where offending lists (extra
+    executions, statement, origin) for each statement issued more often with the large dataset.
+    """
+    for route, (count, _, statements) in large.items():
+        small_count, _, small_statements = small.get(route, (0, 0, []))
+        if count != small_count:
+            before, after = Counter(small_statements), Counter(statements)
+            offending = sorted(((after[key] - before[key],) + key for key in after if after[key] > before[key]),
+                               reverse=True)
+            yield route, small_count, count, offending
@@ -0,0 +1,279 @@
+import hashlib
+import hmac
+import logging
+import os
+import pickle
+import socket
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 300
+
+class NullCache:
+    """Caches nothing; every `get` is a miss."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+class LRUCache(NullCache):
+    """In-process cache bounded to `max_entries`, evicting the least recently used entry.
+
+    Entries also expire `ttl` seconds after they were set (`default_ttl` when not given; 0 means
+    never). Only coherent across workers for keys that embed a version, see CacheVersion.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, default_ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl if ttl else None)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+def _connect(address):
+    """Socket for 'unix:/path/to.sock' or 'host:port'."""
+    if address.startswith('unix:'):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address[len('unix:'):])
+        return sock
+    host, _, port = address.rpartition(':')
+    return socket.create_connection((host or 'localhost', int(port)))
+
+class MemcachedCache(NullCache):
+    """Shared cache speaking the memcached text protocol, so every worker sees the same entries.
+
+    Works against a real memcached or the `CacheServer` stand-in. Each thread keeps its own
+    connection. A cache that can't be reached behaves as a miss rather than failing the request.
+
+    Values are pickled, so each one is stored behind an HMAC-SHA256 of its key and pickle made
+    with `secret_key`; a value whose MAC doesn't verify (written by anyone without the key, or
+    copied from another key) is never unpickled and reads as a miss.
+    """
+    MAX_KEY_LENGTH = 250
+    MAC_SIZE = hashlib.sha256().digest_size
+
+    def __init__(self, address, secret_key, default_ttl=DEFAULT_TTL, key_prefix='', timeout=1.0):
+        if not secret_key:
+            raise ValueError('MemcachedCache needs a secret key to sign its values.')
+        self.address = address
+        self.default_ttl = default_ttl
+        self.key_prefix = key_prefix
+        self.timeout = timeout
+        self._mac_key = hashlib.sha256(b'cache-values:' + (
+            secret_key if isinstance(secret_key, bytes) else secret_key.encode())).digest()
+        self._local = threading.local()
+
+    def _key(self, key):
+        key = (self.key_prefix + key).encode()
+        if len(key) > self.MAX_KEY_LENGTH or any(c <= 32 or c == 127 for c in key):
+            raise ValueError(f'Invalid memcached key: {key!r}')
+        return key
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            sock = _connect(self.address)
+            sock.settimeout(self.timeout)
+            conn = self._local.conn = (sock, sock.makefile('rb'))
+        return conn
+
+    def _drop(self):
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            conn[1].close()
+            conn[0].close()
+
+    def _call(self, request, read_reply):
+        try:
+            sock, reader = self._conn()
+            sock.sendall(request)
+            return read_reply(reader)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError) as e:
+            logger.warning('Cache server %s unavailable: %s', self.address, e)
+            self._drop()
+            return None
+
+    def _mac(self, key, data):
+        return hmac.new(self._mac_key, key + b'\0' + data, hashlib.sha256).digest()
+
+    @staticmethod
+    def _line(reader):
+        line = reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise EOFError('connection closed')
+        return line[:-2]
+
+    def get(self, key):
+        key = self._key(key)
+
+        def read(reader):
+            value = None
+            while True:
+                line = self._line(reader)
+                if line == b'END':
+                    return value
+                parts = line.split()
+                if parts[0] != b'VALUE':
+                    raise ValueError(line.decode(errors='replace'))
+                data = reader.read(int(parts[3]) + 2)[:-2]
+                mac, data = data[:self.MAC_SIZE], data[self.MAC_SIZE:]
+                if hmac.compare_digest(mac, self._mac(key, data)):
+                    value = pickle.loads(data)
+                else:
+                    logger.warning('Ignoring cache entry %r with a bad signature', key)
+        return self._call(b'get ' + key + b'\r\n', read)
+
+    def set(self, key, value, ttl=None):
+        ttl = self.default_ttl if ttl is None else ttl
+        key = self._key(key)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        data = self._mac(key, data) + data
+        header = b'set %s 0 %d %d\r\n' % (key, int(ttl), len(data))
+        self._call(header + data + b'\r\n', self._line)
+
+    def delete(self, key):
+        self._call(b'delete ' + self._key(key) + b'\r\n', self._line)
+
+    def clear(self):
+        self._call(b'flush_all\r\n', self._line)
+
+class _CacheRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            parts = line.split()
+            if not parts:
+                continue
+            command = parts[0]
+            if command == b'get':
+                for key in parts[1:]:
+                    data = store.get(key)
+                    if data is not None:
+                        self.wfile.write(b'VALUE %s 0 %d\r\n%s\r\n' % (key, len(data), data))
+                self.wfile.write(b'END\r\n')
+            elif command == b'set' and len(parts) >= 5:
+                data = self.rfile.read(int(parts[4]) + 2)[:-2]
+                store.set(parts[1], data, ttl=int(parts[3]))
+                self.wfile.write(b'STORED\r\n')
+            elif command == b'delete' and len(parts) >= 2:
+                found = store.get(parts[1]) is not None
+                store.delete(parts[1])
+                self.wfile.write(b'DELETED\r\n' if found else b'NOT_FOUND\r\n')
+            elif command == b'flush_all':
+                store.clear()
+                self.wfile.write(b'OK\r\n')
+            elif command == b'quit':
+                return
+            else:
+                self.wfile.write(b'ERROR\r\n')
+
+class _ThreadingUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class CacheServer:
+    """Minimal memcached-compatible server (get/set/delete/flush_all) over an LRUCache.
+
+    A stand-in for memcached on single-host multi-worker installs and in local testing; listen on
+    'unix:/path/to.sock' or 'host:port' (port 0 picks a free one, see `address`).
+    """
+
+    def __init__(self, address, max_entries=DEFAULT_MAX_ENTRIES):
+        if address.startswith('unix:'):
+            path = address[len('unix:'):]
+            if os.path.exists(path):
+                os.unlink(path)
+            self._server = _ThreadingUnixServer(path, _CacheRequestHandler)
+            self.address = address
+        else:
+            host, _, port = address.rpartition(':')
+            self._server = _ThreadingTCPServer((host or 'localhost', int(port)), _CacheRequestHandler)
+            self.address = '%s:%d' % self._server.server_address[:2]
+        # expiry comes from each set's exptime
+        self._server.store = LRUCache(max_entries, default_ttl=0)
+        self._thread = None
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self):
+        """Serves from a daemon thread; returns self."""
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self.address.startswith('unix:') and os.path.exists(self.address[len('unix:'):]):
+            os.unlink(self.address[len('unix:'):])
+
+def make_cache(config):
+    """Cache backend for the app config's CACHE_TYPE: 'lru' (default), 'memcached' or 'null'."""
+    cache_type = (config.get('CACHE_TYPE') or 'lru').lower()
+    ttl = config.get('CACHE_DEFAULT_TTL', DEFAULT_TTL)
+    if cache_type == 'lru':
+        return LRUCache(config.get('CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES), ttl)
+    if cache_type == 'memcached':
+        if not config.get('CACHE_URL'):
+            raise RuntimeError("CACHE_URL must be set when CACHE_TYPE is 'memcached'.")
+        return MemcachedCache(config['CACHE_URL'], config['SECRET_KEY'], ttl, config.get('CACHE_KEY_PREFIX', ''))
+    if cache_type == 'null':
+        return NullCache()
+    raise RuntimeError(f"Unknown CACHE_TYPE '{cache_type}'.")
+
+def get_cache():
+    """The app's cache backend."""
+    return current_app.extensions['cache']
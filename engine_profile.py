@@ -0,0 +1,40 @@
+from sqlalchemy import event
+
+# Applied to every new SQLite connection. WAL lets dashboard reads run alongside a check-in's
+# write instead of failing with "database is locked"; synchronous=NORMAL is durable in WAL mode
+# except for the last transactions on power loss.
+DEFAULT_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,       # ms to wait on a lock before failing
+    'cache_size': -20000,       # negative = KiB, i.e. ~20 MB page cache per connection
+    'mmap_size': 268435456,     # 256 MB of the file read through mmap
+    'temp_store': 'MEMORY',
+}
+
+POOL_OPTIONS = {
+    'DB_POOL_SIZE': 'pool_size',
+    'DB_MAX_OVERFLOW': 'max_overflow',
+    'DB_POOL_TIMEOUT': 'pool_timeout',
+    'DB_POOL_RECYCLE': 'pool_recycle',
+    'DB_POOL_PRE_PING': 'pool_pre_ping',
+}
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS with the DB_POOL_* settings that are set; explicit options win."""
+    options = {option: config[key] for key, option in POOL_OPTIONS.items() if config.get(key) is not None}
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Runs `PRAGMA name = value` for each of `pragmas` on every new connection of a SQLite engine."""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+    statements = [f'PRAGMA {name} = {value}' for name, value in pragmas.items()]
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for statement in statements:
+            cursor.execute(statement)
+        cursor.close()
@@ -67,7 +67,7 @@ class BookSpotForm(FlaskForm):
     def validate_vehicle_number(self, vehicle_number):
         existing_reservation = Reservation.query.filter(
             Reservation.vehicle_number == vehicle_number.data,
-            Reservation.status.in_(['pending', 'active'])
+            Reservation.is_open()
         ).first()
         if existing_reservation:
             raise ValidationError(
@@ -0,0 +1,429 @@
+import bisect
+import contextlib
+import glob
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+from flask import current_app, g, request
+from sqlalchemy import event
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+_USED = struct.Struct('<I')
+_LENGTH = struct.Struct('<I')
+_DOUBLE = struct.Struct('<d')
+
+# name -> (type, help), in registration order; SAMPLE_FAMILIES maps each sample name to its family
+FAMILIES = {}
+SAMPLE_FAMILIES = {}
+HISTOGRAM_BUCKETS = {}
+
+# counters and histograms of exited workers, folded together so their files can be deleted
+AGGREGATE_FILE = 'aggregate.json'
+LOCK_FILE = '.lock'
+DEAD_SUFFIX = '.dead'
+
+def _entries(data, used):
+    """(key, value offset, value) for each entry of a values file's first `used` bytes."""
+    pos = 8
+    while pos < used:
+        (length,) = _LENGTH.unpack_from(data, pos)
+        key_end = pos + 4 + length
+        value_pos = key_end + (-key_end % 8)
+        yield bytes(data[pos + 4:key_end]).decode('utf-8'), value_pos, _DOUBLE.unpack_from(data, value_pos)[0]
+        pos = value_pos + 8
+
+def _kind(key):
+    family = SAMPLE_FAMILIES.get(key.partition('{')[0])
+    return None if family is None else FAMILIES[family][0]
+
+@contextlib.contextmanager
+def _directory_lock(directory):
+    """Holds an exclusive lock on `directory` across processes; yields False where there is none."""
+    if fcntl is None:
+        yield False
+        return
+    with open(os.path.join(directory, LOCK_FILE), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+class MetricValues:
+    """This process's metric values, kept in `<directory>/<pid>.db` so every worker can read them.
+
+    The file is memory-mapped and written only by its own process: an update is an in-place
+    read-modify-write of one float under an uncontended per-process lock, with no I/O or
+    cross-process locking. Layout: 8-byte header holding the bytes in use, then entries of
+    [uint32 key length][UTF-8 key padded to 8 bytes][float64]. Keys are whole sample names
+    including labels, e.g. `parking_bookings_total` or `http_requests_in_flight{endpoint="..."}`.
+    A forked child notices the pid change and starts its own file. Taking over a file left by
+    an exited process with the same pid keeps its counters but zeroes its gauges, which
+    described that process.
+    """
+
+    INITIAL_SIZE = 64 * 1024
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _open(self):
+        self._pid = os.getpid()
+        os.makedirs(self.directory, exist_ok=True)
+        # under the directory lock so a scrape can't fold the file away while we take it over
+        with _directory_lock(self.directory):
+            self._fd = os.open(os.path.join(self.directory, f'{self._pid}.db'), os.O_RDWR | os.O_CREAT, 0o644)
+            size = os.fstat(self._fd).st_size
+            if size < self.INITIAL_SIZE:
+                os.ftruncate(self._fd, self.INITIAL_SIZE)
+                size = self.INITIAL_SIZE
+            self._map = mmap.mmap(self._fd, size)
+        self._used = _USED.unpack_from(self._map, 0)[0] or 8
+        self._offsets = {}
+        for key, offset, _ in _entries(self._map, self._used):
+            self._offsets[key] = offset
+            if _kind(key) == 'gauge':
+                _DOUBLE.pack_into(self._map, offset, 0.0)
+
+    def _offset(self, key):
+        if self._pid != os.getpid():
+            self._open()
+        offset = self._offsets.get(key)
+        if offset is None:
+            encoded = key.encode('utf-8')
+            key_end = self._used + 4 + len(encoded)
+            offset = key_end + (-key_end % 8)
+            if offset + 8 > len(self._map):
+                size = len(self._map) * 2
+                while offset + 8 > size:
+                    size *= 2
+                self._map.close()
+                os.ftruncate(self._fd, size)
+                self._map = mmap.mmap(self._fd, size)
+            _LENGTH.pack_into(self._map, self._used, len(encoded))
+            self._map[self._used + 4:key_end] = encoded
+            _DOUBLE.pack_into(self._map, offset, 0.0)
+            # readers only look at the entries below the header's count, so bump it last
+            self._used = offset + 8
+            _USED.pack_into(self._map, 0, self._used)
+            self._offsets[key] = offset
+        return offset
+
+    def add(self, key, amount=1.0):
+        with self._lock:
+            offset = self._offset(key)
+            _DOUBLE.pack_into(self._map, offset, _DOUBLE.unpack_from(self._map, offset)[0] + amount)
+
+    def set(self, key, value):
+        with self._lock:
+            offset = self._offset(key)
+            _DOUBLE.pack_into(self._map, offset, value)
+
+_values_by_directory = {}
+_values_lock = threading.Lock()
+
+def metric_values(directory):
+    """The process-wide MetricValues for `directory`; apps sharing a directory share one writer."""
+    directory = os.path.abspath(directory)
+    with _values_lock:
+        values = _values_by_directory.get(directory)
+        if values is None:
+            values = _values_by_directory[directory] = MetricValues(directory)
+        return values
+
+def _process_running(pid):
+    if pid == os.getpid():
+        return True
+    if os.name != 'posix':
+        return True  # os.kill(pid, 0) would terminate the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _label_text(labels):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels)
+
+def _sample_key(name, labels):
+    return f'{name}{{{_label_text(labels)}}}' if labels else name
+
+def _values():
+    return current_app.extensions.get('metrics')
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text):
+        self.name = name
+        FAMILIES[name] = (self.kind, help_text)
+        SAMPLE_FAMILIES[name] = name
+        self._keys = {}
+
+    def _key(self, labels):
+        if not labels:
+            return self.name
+        labels = tuple(labels.items())
+        key = self._keys.get(labels)
+        if key is None:
+            key = self._keys[labels] = _sample_key(self.name, labels)
+        return key
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        values = _values()
+        if values is not None:
+            values.add(self._key(labels), amount)
+
+class Gauge(_Metric):
+    """Summed over the worker processes that are still running."""
+
+    kind = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        values = _values()
+        if values is not None:
+            values.add(self._key(labels), amount)
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        values = _values()
+        if values is not None:
+            values.set(self._key(labels), value)
+
+class Histogram(_Metric):
+    """Stores a plain count per bucket plus the sum (two updates per observation); the
+    cumulative `_bucket` series and `_count` are built when the metrics are rendered."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        del SAMPLE_FAMILIES[name]
+        SAMPLE_FAMILIES[f'{name}_bucket'] = SAMPLE_FAMILIES[f'{name}_sum'] = name
+        HISTOGRAM_BUCKETS[name] = self.buckets = buckets
+
+    def _key(self, labels):
+        labels = tuple(labels.items())
+        keys = self._keys.get(labels)
+        if keys is None:
+            # `le` goes first so rendering can split it off the stored key
+            keys = self._keys[labels] = (
+                [_sample_key(f'{self.name}_bucket', (('le', _format_bound(bound)),) + labels) for bound in self.buckets],
+                _sample_key(f'{self.name}_sum', labels),
+            )
+        return keys
+
+    def observe(self, value, **labels):
+        values = _values()
+        if values is not None:
+            bucket_keys, sum_key = self._key(labels)
+            values.add(bucket_keys[bisect.bisect_left(self.buckets, value)])
+            values.add(sum_key, value)
+
+def _format_bound(bound):
+    return '+Inf' if bound == float('inf') else repr(bound)
+
+def _format_value(value):
+    return repr(float(value))
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Time spent serving requests, by blueprint and endpoint.')
+REQUESTS_IN_FLIGHT = Gauge('http_requests_in_flight', 'Requests being served right now, by blueprint and endpoint.')
+DB_POOL_SIZE = Gauge('db_pool_size', 'Connections the pool keeps open (pool_size), summed over workers.')
+DB_POOL_CONNECTIONS = Gauge('db_pool_connections', 'Open database connections.')
+DB_POOL_CHECKED_OUT = Gauge('db_pool_checked_out', 'Database connections currently in use.')
+DB_POOL_CHECKOUTS = Counter('db_pool_checkouts_total', 'Connections handed out by the pool.')
+BOOKINGS = Counter('parking_bookings_total', 'Spots reserved.')
+CHECK_INS = Counter('parking_check_ins_total', 'Reservations checked in.')
+PARK_OUTS = Counter('parking_park_outs_total', 'Reservations parked out (completed).')
+CANCELLATIONS = Counter('parking_cancellations_total', 'Pending reservations cancelled.')
+BOOKING_FAILURES = Counter('parking_booking_failures_total', 'Booking attempts that were turned away, by reason.')
+
+def _file_values(path):
+    """{key: value} of a values file, or None if it can't be read."""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < 8:
+        return {}
+    used = min(_USED.unpack_from(data, 0)[0], len(data))
+    return {key: value for key, _, value in _entries(data, used)}
+
+def _read_aggregate(directory):
+    try:
+        with open(os.path.join(directory, AGGREGATE_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'values': {}, 'merged': []}
+
+def _fold_dead_processes(directory):
+    """Moves the counters and histograms of exited processes into AGGREGATE_FILE and deletes
+    their files, so the directory doesn't grow with every worker restart. Gauges of exited
+    processes are dropped.
+
+    A dead process's file is first renamed to a unique `.dead` name, then the new aggregate,
+    which lists the `.dead` names it has absorbed, atomically replaces the old one, and only
+    then are the `.dead` files removed. A crash at any point therefore neither loses nor
+    double-counts a file: the next fold skips the `.dead` files the aggregate already lists.
+    Call with the directory lock held.
+    """
+    for path in glob.glob(os.path.join(directory, '*.db')):
+        try:
+            pid = int(os.path.basename(path)[:-3])
+        except ValueError:
+            continue
+        if not _process_running(pid):
+            os.replace(path, os.path.join(directory, f'{pid}-{uuid.uuid4().hex}{DEAD_SUFFIX}'))
+    dead = {os.path.basename(path): path for path in glob.glob(os.path.join(directory, f'*{DEAD_SUFFIX}'))}
+    if not dead:
+        return
+    aggregate = _read_aggregate(directory)
+    merged = set(aggregate['merged'])
+    pending = {name: _file_values(path) for name, path in dead.items() if name not in merged}
+    pending = {name: file_values for name, file_values in pending.items() if file_values is not None}
+    if pending:
+        values = aggregate['values']
+        for file_values in pending.values():
+            for key, value in file_values.items():
+                if _kind(key) not in (None, 'gauge'):
+                    values[key] = values.get(key, 0.0) + value
+        # names already folded whose files are gone can't come back, so stop listing them
+        aggregate['merged'] = sorted((merged & dead.keys()) | pending.keys())
+        temporary = os.path.join(directory, f'{AGGREGATE_FILE}.{os.getpid()}.tmp')
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(aggregate, f)
+        os.replace(temporary, os.path.join(directory, AGGREGATE_FILE))
+    for name in merged | pending.keys():
+        if name in dead:
+            os.remove(dead[name])
+
+def collect(directory):
+    """Every process's values summed by key; gauges only count processes still running."""
+    os.makedirs(directory, exist_ok=True)
+    totals = {}
+    # one lock for folding and reading, so a concurrent scrape's fold can't move values mid-read
+    with _directory_lock(directory) as locked:
+        if locked:
+            _fold_dead_processes(directory)
+        for key, value in _read_aggregate(directory)['values'].items():
+            if _kind(key) is not None:
+                totals[key] = value
+        for path in glob.glob(os.path.join(directory, '*.db')):
+            try:
+                pid = int(os.path.basename(path)[:-3])
+            except ValueError:
+                continue
+            values = _file_values(path)
+            if values is None:
+                continue
+            running = _process_running(pid)
+            for key, value in values.items():
+                kind = _kind(key)
+                if kind is None or (not running and kind == 'gauge'):
+                    continue
+                totals[key] = totals.get(key, 0.0) + value
+    return totals
+
+def _histogram_lines(name, samples):
+    series = {}
+    for key, value in samples:
+        sample, _, rest = key.partition('{')
+        if sample.endswith('_sum'):
+            series.setdefault(rest[:-1], [{}, 0.0])[1] = value
+        else:
+            bound, _, labels = rest[:-1].partition(',')
+            series.setdefault(labels, [{}, 0.0])[0][bound[len('le="'):-1]] = value
+    lines = []
+    for labels, (buckets, total) in sorted(series.items()):
+        prefix = f'{labels},' if labels else ''
+        suffix = f'{{{labels}}}' if labels else ''
+        count = 0.0
+        for bound in HISTOGRAM_BUCKETS[name]:
+            count += buckets.get(_format_bound(bound), 0.0)
+            lines.append(f'{name}_bucket{{{prefix}le="{_format_bound(bound)}"}} {_format_value(count)}')
+        lines.append(f'{name}_count{suffix} {_format_value(count)}')
+        lines.append(f'{name}_sum{suffix} {_format_value(total)}')
+    return lines
+
+def render(directory):
+    """All metrics in the Prometheus text exposition format."""
+    by_family = {}
+    for key, value in collect(directory).items():
+        by_family.setdefault(SAMPLE_FAMILIES[key.partition('{')[0]], []).append((key, value))
+    lines = []
+    for name, (kind, help_text) in FAMILIES.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        samples = sorted(by_family.get(name, ()))
+        if kind == 'histogram':
+            lines.extend(_histogram_lines(name, samples))
+        else:
+            lines.extend(f'{key} {_format_value(value)}' for key, value in samples)
+    return '\n'.join(lines) + '\n'
+
+def _request_labels():
+    return {'blueprint': request.blueprint or '', 'endpoint': request.endpoint or 'none'}
+
+def init_metrics(app, engine):
+    """Records request latency/in-flight counts and pool usage into METRICS_DIR.
+
+    Each worker process writes its own file there; the /metrics endpoint of any worker
+    sums them all, so point every worker of a deployment at the same directory.
+    """
+    if not app.config.get('METRICS_ENABLED'):
+        return
+    app.extensions['metrics'] = values = metric_values(app.config['METRICS_DIR'])
+
+    def record(metric, *args):
+        # pool events can fire outside a request, so these don't go through current_app
+        values.add(metric._key({}), *args)
+
+    if hasattr(engine.pool, 'size'):
+        values.set(DB_POOL_SIZE._key({}), engine.pool.size())
+    event.listen(engine, 'connect', lambda *args: record(DB_POOL_CONNECTIONS, 1))
+    event.listen(engine, 'close', lambda *args: record(DB_POOL_CONNECTIONS, -1))
+    event.listen(engine, 'close_detached', lambda *args: record(DB_POOL_CONNECTIONS, -1))
+    event.listen(engine, 'checkin', lambda *args: record(DB_POOL_CHECKED_OUT, -1))
+
+    @event.listens_for(engine, 'checkout')
+    def count_checkout(*args):
+        record(DB_POOL_CHECKED_OUT, 1)
+        record(DB_POOL_CHECKOUTS, 1)
+
+    @app.before_request
+    def start_request_metrics():
+        g.metrics_started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc(**_request_labels())
+
+    @app.teardown_request
+    def finish_request_metrics(exc):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        labels = _request_labels()
+        REQUESTS_IN_FLIGHT.dec(**labels)
+        REQUEST_LATENCY.observe(time.perf_counter() - started, **labels)
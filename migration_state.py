@@ -0,0 +1,41 @@
+import ast
+import os
+import re
+from sqlalchemy import inspect, text
+
+REVISION_LINE = re.compile(r'^(revision|down_revision)\s*=\s*(.+?)\s*$', re.MULTILINE)
+
+def script_heads(versions_dir):
+    """Head revision ids of the migration scripts, read from their `revision`/`down_revision` lines.
+
+    This avoids importing Alembic, which costs more than the rest of startup's own work.
+    Returns None if a script can't be parsed.
+    """
+    revisions, parents = set(), set()
+    for name in os.listdir(versions_dir):
+        if not name.endswith('.py'):
+            continue
+        with open(os.path.join(versions_dir, name), encoding='utf-8') as f:
+            found = dict(REVISION_LINE.findall(f.read()))
+        try:
+            revision = ast.literal_eval(found['revision'])
+            down_revision = ast.literal_eval(found.get('down_revision', 'None'))
+        except (KeyError, ValueError, SyntaxError):
+            return None
+        revisions.add(revision)
+        if isinstance(down_revision, str):
+            parents.add(down_revision)
+        elif down_revision:
+            parents.update(down_revision)
+    return revisions - parents
+
+def database_revisions(engine):
+    """Revision ids stamped in the database's alembic_version table (empty if it has none)."""
+    with engine.connect() as conn:
+        if not inspect(conn).has_table('alembic_version'):
+            return set()
+        return {row[0] for row in conn.execute(text('SELECT version_num FROM alembic_version'))}
+
+def is_at_head(engine, migrations_dir):
+    heads = script_heads(os.path.join(migrations_dir, 'versions'))
+    return heads is not None and database_revisions(engine) == heads
@@ -0,0 +1,38 @@
+"""Add denormalized spot counters to parking_lot
+
+Revision ID: 3c1f9a2b8d47
+Revises: 7da607b5f235
+Create Date: 2025-10-01 10:12:41.208311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f9a2b8d47'
+down_revision = '7da607b5f235'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('available_spots', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('reserved_spots', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('occupied_spots', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill from the existing spots
+    op.execute("""
+        UPDATE parking_lot SET
+            available_spots = (SELECT COUNT(*) FROM parking_spot WHERE parking_spot.lot_id = parking_lot.id AND parking_spot.status = 'Available'),
+            reserved_spots = (SELECT COUNT(*) FROM parking_spot WHERE parking_spot.lot_id = parking_lot.id AND parking_spot.status = 'Reserved'),
+            occupied_spots = (SELECT COUNT(*) FROM parking_spot WHERE parking_spot.lot_id = parking_lot.id AND parking_spot.status = 'Occupied')
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('parking_lot', schema=None) as batch_op:
+        batch_op.drop_column('occupied_spots')
+        batch_op.drop_column('reserved_spots')
+        batch_op.drop_column('available_spots')
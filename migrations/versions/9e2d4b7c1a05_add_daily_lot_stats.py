@@ -0,0 +1,74 @@
+"""Add daily_lot_stats rollup table
+
+Revision ID: 9e2d4b7c1a05
+Revises: 3c1f9a2b8d47
+Create Date: 2025-10-03 18:40:09.551274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e2d4b7c1a05'
+down_revision = '3c1f9a2b8d47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('daily_lot_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('lot_id', sa.Integer(), nullable=True),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('bookings', sa.Integer(), nullable=False),
+    sa.Column('check_ins', sa.Integer(), nullable=False),
+    sa.Column('completions', sa.Integer(), nullable=False),
+    sa.Column('cancellations', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('parked_minutes', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['lot_id'], ['parking_lot.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('lot_id', 'day', name='_lot_day_uc')
+    )
+
+    with op.batch_alter_table('daily_lot_stats', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_daily_lot_stats_day'), ['day'], unique=False)
+
+    # Backfill from the existing reservation history (days are IST, a fixed +05:30 offset)
+    if op.get_bind().dialect.name == 'postgresql':
+        day = "CAST({} + INTERVAL '330 minutes' AS DATE)".format
+        minutes = "EXTRACT(EPOCH FROM ({1} - {0})) / 60".format
+    else:
+        day = "date({}, '+330 minutes')".format
+        minutes = "(julianday({1}) - julianday({0})) * 1440".format
+    op.execute(f"""
+        INSERT INTO daily_lot_stats (lot_id, day, bookings, check_ins, completions, cancellations, revenue, parked_minutes)
+        SELECT lot_id, day, SUM(bookings), SUM(check_ins), SUM(completions), SUM(cancellations), SUM(revenue), SUM(parked_minutes)
+        FROM (
+            SELECT parking_spot.lot_id AS lot_id, {day('reservation.booking_timestamp')} AS day,
+                   1 AS bookings, 0 AS check_ins, 0 AS completions,
+                   CASE WHEN reservation.status = 'cancelled' THEN 1 ELSE 0 END AS cancellations,
+                   0.0 AS revenue, 0 AS parked_minutes
+            FROM reservation LEFT OUTER JOIN parking_spot ON reservation.spot_id = parking_spot.id
+            UNION ALL
+            SELECT parking_spot.lot_id, {day('reservation.check_in_timestamp')},
+                   0, 1, 0, 0, 0.0, 0
+            FROM reservation LEFT OUTER JOIN parking_spot ON reservation.spot_id = parking_spot.id
+            WHERE reservation.check_in_timestamp IS NOT NULL
+            UNION ALL
+            SELECT parking_spot.lot_id, {day('reservation.check_out_timestamp')},
+                   0, 0, 1, 0, COALESCE(reservation.total_cost, 0.0),
+                   COALESCE(CAST(ROUND({minutes('reservation.check_in_timestamp', 'reservation.check_out_timestamp')}) AS INTEGER), 0)
+            FROM reservation LEFT OUTER JOIN parking_spot ON reservation.spot_id = parking_spot.id
+            WHERE reservation.status = 'completed' AND reservation.check_out_timestamp IS NOT NULL
+        ) AS activity
+        GROUP BY lot_id, day
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('daily_lot_stats', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_daily_lot_stats_day'))
+
+    op.drop_table('daily_lot_stats')
@@ -0,0 +1,42 @@
+"""Add indexes for reservation and spot hot-path queries
+
+Revision ID: b41e6f0d92c3
+Revises: 9e2d4b7c1a05
+Create Date: 2025-10-06 09:27:53.114802
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b41e6f0d92c3'
+down_revision = '9e2d4b7c1a05'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('parking_spot', schema=None) as batch_op:
+        batch_op.create_index('ix_parking_spot_lot_status_number', ['lot_id', 'status', 'spot_number'], unique=False)
+
+    with op.batch_alter_table('reservation', schema=None) as batch_op:
+        batch_op.create_index('ix_reservation_status', ['status'], unique=False)
+        batch_op.create_index('ix_reservation_user_booking', ['user_id', 'booking_timestamp'], unique=False)
+        batch_op.create_index('ix_reservation_user_status_checkout', ['user_id', 'status', 'check_out_timestamp'], unique=False)
+        batch_op.create_index('ix_reservation_spot_status', ['spot_id', 'status'], unique=False)
+        batch_op.create_index('ix_reservation_open_vehicle', ['vehicle_number'], unique=False,
+                              sqlite_where=sa.text("status IN ('pending', 'active')"),
+                              postgresql_where=sa.text("status IN ('pending', 'active')"))
+
+
+def downgrade():
+    with op.batch_alter_table('reservation', schema=None) as batch_op:
+        batch_op.drop_index('ix_reservation_open_vehicle')
+        batch_op.drop_index('ix_reservation_spot_status')
+        batch_op.drop_index('ix_reservation_user_status_checkout')
+        batch_op.drop_index('ix_reservation_user_booking')
+        batch_op.drop_index('ix_reservation_status')
+
+    with op.batch_alter_table('parking_spot', schema=None) as batch_op:
+        batch_op.drop_index('ix_parking_spot_lot_status_number')
@@ -0,0 +1,38 @@
+"""Add integer spot_index to parking_spot
+
+Revision ID: c7a3e915f6d8
+Revises: b41e6f0d92c3
+Create Date: 2025-10-08 14:05:37.602918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7a3e915f6d8'
+down_revision = 'b41e6f0d92c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('parking_spot', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('spot_index', sa.Integer(), nullable=True))
+
+    # Spots have always been labelled S<n> (older ones A<n>), so the number is the index
+    op.execute("UPDATE parking_spot SET spot_index = CAST(LTRIM(spot_number, 'AS') AS INTEGER)")
+
+    with op.batch_alter_table('parking_spot', schema=None) as batch_op:
+        batch_op.alter_column('spot_index', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_index('ix_parking_spot_lot_status_number')
+        batch_op.create_index('ix_parking_spot_lot_status_index', ['lot_id', 'status', 'spot_index'], unique=False)
+        batch_op.create_unique_constraint('_lot_spot_index_uc', ['lot_id', 'spot_index'])
+
+
+def downgrade():
+    with op.batch_alter_table('parking_spot', schema=None) as batch_op:
+        batch_op.drop_constraint('_lot_spot_index_uc', type_='unique')
+        batch_op.drop_index('ix_parking_spot_lot_status_index')
+        batch_op.create_index('ix_parking_spot_lot_status_number', ['lot_id', 'status', 'spot_number'], unique=False)
+        batch_op.drop_column('spot_index')
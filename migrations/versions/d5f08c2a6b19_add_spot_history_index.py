@@ -0,0 +1,26 @@
+"""Add index for paginated spot reservation history
+
+Revision ID: d5f08c2a6b19
+Revises: c7a3e915f6d8
+Create Date: 2025-10-10 11:48:02.370194
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f08c2a6b19'
+down_revision = 'c7a3e915f6d8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reservation', schema=None) as batch_op:
+        batch_op.create_index('ix_reservation_spot_booking', ['spot_id', 'booking_timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('reservation', schema=None) as batch_op:
+        batch_op.drop_index('ix_reservation_spot_booking')
@@ -0,0 +1,78 @@
+"""Add FTS5 trigram search indexes for parking_lot and user
+
+Revision ID: e2b9d7140a3f
+Revises: d5f08c2a6b19
+Create Date: 2025-10-12 16:21:44.905317
+
+"""
+import logging
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b9d7140a3f'
+down_revision = 'd5f08c2a6b19'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+# (source table, FTS table, indexed columns)
+FTS_INDEXES = [
+    ('parking_lot', 'parking_lot_fts', ('name', 'address', 'pin_code')),
+    ('user', 'user_fts', ('username', 'email', 'full_name')),
+]
+
+
+def _create_fts_index(source, fts, columns):
+    cols = ', '.join(columns)
+    new_values = ', '.join(f'new.{c}' for c in columns)
+    old_values = ', '.join(f'old.{c}' for c in columns)
+
+    op.execute(f"CREATE VIRTUAL TABLE {fts} USING fts5({cols}, content='{source}', content_rowid='id', tokenize='trigram')")
+    op.execute(f"""
+        CREATE TRIGGER {fts}_ai AFTER INSERT ON "{source}" BEGIN
+            INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values});
+        END
+    """)
+    op.execute(f"""
+        CREATE TRIGGER {fts}_ad AFTER DELETE ON "{source}" BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+        END
+    """)
+    # Only text edits touch the index, not e.g. the per-lot spot counters
+    op.execute(f"""
+        CREATE TRIGGER {fts}_au AFTER UPDATE OF {cols} ON "{source}" BEGIN
+            INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_values});
+        END
+    """)
+    op.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def _drop_fts_index(fts):
+    for suffix in ('ai', 'ad', 'au'):
+        op.execute(f"DROP TRIGGER IF EXISTS {fts}_{suffix}")
+    op.execute(f"DROP TABLE IF EXISTS {fts}")
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for source, fts, columns in FTS_INDEXES:
+        try:
+            _create_fts_index(source, fts, columns)
+        except sa.exc.OperationalError as e:
+            # SQLite built without FTS5 or the trigram tokenizer (< 3.34); search falls back to LIKE
+            logger.warning("Skipping %s full-text index: %s", source, e)
+            _drop_fts_index(fts)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for source, fts, columns in FTS_INDEXES:
+        _drop_fts_index(fts)
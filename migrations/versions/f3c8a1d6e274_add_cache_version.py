@@ -0,0 +1,28 @@
+"""Add cache_version table
+
+Revision ID: f3c8a1d6e274
+Revises: e2b9d7140a3f
+Create Date: 2025-10-13 11:22:47.308516
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3c8a1d6e274'
+down_revision = 'e2b9d7140a3f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cache_version',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('cache_version')
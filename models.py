@@ -1,10 +1,67 @@
-from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from datetime import datetime, date
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, FunctionElement
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+import pytz
+from passwords import password_hasher
 
 db = SQLAlchemy()
 
+# Databases the SQL below is written for; create_app refuses any other DATABASE_URL
+SUPPORTED_DIALECTS = ('sqlite', 'postgresql')
+
+IST = pytz.timezone('Asia/Kolkata')
+# IST is a fixed UTC+05:30 offset (no DST), so the database can bucket UTC timestamps into IST days directly
+IST_OFFSET_MINUTES = 330
+IST_OFFSET_MODIFIER = f'+{IST_OFFSET_MINUTES} minutes'
+
+class ist_date(FunctionElement):
+    """SQL expression for the IST calendar date ('YYYY-MM-DD' text) of a naive UTC timestamp column."""
+    type = db.String()
+    name = 'ist_date'
+    inherit_cache = True
+
+@compiles(ist_date)
+def _ist_date_sqlite(element, compiler, **kw):
+    column, = element.clauses
+    return compiler.process(db.func.date(column, IST_OFFSET_MODIFIER), **kw)
+
+@compiles(ist_date, 'postgresql')
+def _ist_date_postgresql(element, compiler, **kw):
+    # rendered inline so a GROUP BY on the same expression matches it without bound parameters
+    column, = element.clauses
+    return f"to_char({compiler.process(column, **kw)} + INTERVAL '{IST_OFFSET_MINUTES} minutes', 'YYYY-MM-DD')"
+
+class minutes_between(FunctionElement):
+    """SQL expression for the (fractional) minutes from one timestamp column to another."""
+    type = db.Float()
+    name = 'minutes_between'
+    inherit_cache = True
+
+@compiles(minutes_between)
+def _minutes_between_sqlite(element, compiler, **kw):
+    start, end = element.clauses
+    return compiler.process((db.func.julianday(end) - db.func.julianday(start)) * 1440, **kw)
+
+@compiles(minutes_between, 'postgresql')
+def _minutes_between_postgresql(element, compiler, **kw):
+    start, end = element.clauses
+    return f"EXTRACT(EPOCH FROM ({compiler.process(end, **kw)} - {compiler.process(start, **kw)})) / 60"
+
+def upsert(model, dialect_name):
+    """INSERT for `model` that takes `.on_conflict_do_update()`; SQLite and PostgreSQL share the syntax."""
+    return (postgresql_insert if dialect_name == 'postgresql' else sqlite_insert)(model)
+
+OPEN_RESERVATION_STATUSES = ('pending', 'active')
+RESERVATION_STATUSES = OPEN_RESERVATION_STATUSES + ('completed', 'cancelled')
+
+def to_ist_date(timestamp):
+    """IST calendar date of a naive UTC datetime."""
+    return timestamp.replace(tzinfo=pytz.utc).astimezone(IST).date()
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), index=True, unique=True, nullable=False)
@@ -12,13 +69,18 @@ class User(UserMixin, db.Model):
     email = db.Column(db.String(120), index=True, unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
     is_admin = db.Column(db.Boolean, default=False)
-    reservations = db.relationship('Reservation', backref='tenant', lazy='dynamic') 
+    # selectin: reservation lists load their tenants in one IN query (skipping users already in the session)
+    reservations = db.relationship('Reservation', backref=db.backref('tenant', lazy='selectin'), lazy='dynamic') 
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher().hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher().verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """True if the stored hash predates the configured PASSWORD_HASH_METHOD."""
+        return password_hasher().needs_rehash(self.password_hash)
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -31,19 +93,153 @@ class ParkingLot(db.Model):
     price_per_hour = db.Column(db.Float, nullable=False)
     maximum_capacity = db.Column(db.Integer, nullable=False) 
     is_active = db.Column(db.Boolean, default=True, nullable=False)
-    spots = db.relationship('ParkingSpot', backref='parking_lot', lazy='dynamic', cascade="all, delete-orphan")
+    # Denormalized spot counters, kept in step with ParkingSpot.status changes
+    available_spots = db.Column(db.Integer, default=0, nullable=False)
+    reserved_spots = db.Column(db.Integer, default=0, nullable=False)
+    occupied_spots = db.Column(db.Integer, default=0, nullable=False)
+    # joined: a spot is almost always shown with its lot
+    spots = db.relationship('ParkingSpot', backref=db.backref('parking_lot', lazy='joined'), lazy='dynamic', cascade="all, delete-orphan")
+
+    SPOT_COUNTERS = {
+        'Available': 'available_spots',
+        'Reserved': 'reserved_spots',
+        'Occupied': 'occupied_spots',
+    }
+
+    def adjust_spot_counts(self, from_status=None, to_status=None, count=1):
+        """Moves `count` spots between status counters in the current transaction.
+
+        The change is written as `col = col +/- n` so concurrent writers don't lose updates.
+        """
+        if from_status:
+            self._shift_counter(self.SPOT_COUNTERS[from_status], -count)
+        if to_status:
+            self._shift_counter(self.SPOT_COUNTERS[to_status], count)
+
+    def _shift_counter(self, column, delta):
+        pending = self.__dict__.get(column)
+        base = pending if isinstance(pending, ClauseElement) else getattr(ParkingLot, column)
+        setattr(self, column, base + delta)
+
+    @classmethod
+    def recount_spots(cls, lot_ids=None):
+        """Recomputes the spot counters from parking_spot. Caller commits."""
+        values = {}
+        for status, column in cls.SPOT_COUNTERS.items():
+            values[column] = db.select(db.func.count(ParkingSpot.id)).where(
+                ParkingSpot.lot_id == cls.id,
+                ParkingSpot.status == status
+            ).scalar_subquery()
+        stmt = db.update(cls).values(**values)
+        if lot_ids is not None:
+            stmt = stmt.where(cls.id.in_(lot_ids))
+        return db.session.execute(stmt).rowcount
 
     def __repr__(self):
         return f'<ParkingLot {self.name}>'
 
 class ParkingSpot(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    spot_number = db.Column(db.String(20), nullable=False)
+    spot_number = db.Column(db.String(20), nullable=False) # display label, derived from spot_index
+    spot_index = db.Column(db.Integer, nullable=False) # per-lot position; all ordering uses this
     lot_id = db.Column(db.Integer, db.ForeignKey('parking_lot.id'), nullable=False)
     status = db.Column(db.String(20), default='Available', nullable=False) 
-    spot_reservations = db.relationship('Reservation', backref='parking_spot', lazy='dynamic')
+    # joined: reservation histories always show the spot (and, via the spot, its lot)
+    spot_reservations = db.relationship('Reservation', backref=db.backref('parking_spot', lazy='joined'), lazy='dynamic')
+
+    __table_args__ = (
+        db.UniqueConstraint('lot_id', 'spot_number', name='_lot_spot_uc'),
+        db.UniqueConstraint('lot_id', 'spot_index', name='_lot_spot_index_uc'),
+        # book_spot: first available spot of a lot in spot order
+        db.Index('ix_parking_spot_lot_status_index', 'lot_id', 'status', 'spot_index'),
+    )
+
+    CLAIM_ATTEMPTS = 5
+    INSERT_BATCH_SIZE = 1000
+    # ids per IN (...) list; under the 999 bound parameters older SQLite builds allow
+    DELETE_BATCH_SIZE = 900
+
+    @staticmethod
+    def format_spot_number(spot_index):
+        return f"S{spot_index:03d}"
+
+    @classmethod
+    def next_index(cls, lot_id):
+        """Index the lot's next new spot should get."""
+        last_index = db.session.query(db.func.max(cls.spot_index)).filter_by(lot_id=lot_id).scalar()
+        return (last_index or 0) + 1
+
+    @classmethod
+    def bulk_create(cls, lot_id, first_index, count):
+        """Inserts `count` available spots indexed from `first_index` as batched executemany INSERTs."""
+        indexes = range(first_index, first_index + count)
+        for start in range(0, count, cls.INSERT_BATCH_SIZE):
+            db.session.execute(cls.__table__.insert(), [
+                {'spot_index': i, 'spot_number': cls.format_spot_number(i), 'lot_id': lot_id, 'status': 'Available'}
+                for i in indexes[start:start + cls.INSERT_BATCH_SIZE]
+            ])
+
+    @classmethod
+    def bulk_delete_free(cls, lot_id, count):
+        """Deletes up to `count` of the lot's highest-numbered free spots; returns how many went.
+
+        Free means Available with no pending/active reservation. The spots are picked once, locked
+        on PostgreSQL (skipping any a booker holds right now), and both the UPDATE that detaches
+        their past reservations, as an ORM delete would, and the DELETE act on exactly that list.
+        Both also require the spot to still be Available, which keeps out a spot claimed between
+        the pick and SQLite's write lock. Caller commits or rolls back.
+        """
+        ids = db.session.scalars(
+            db.select(cls.id).where(
+                cls.lot_id == lot_id,
+                cls.status == 'Available',
+                ~cls.spot_reservations.any(Reservation.is_open())
+            ).order_by(cls.spot_index.desc()).limit(count).with_for_update(skip_locked=True, of=cls)
+        ).all()
+
+        deleted = 0
+        for start in range(0, len(ids), cls.DELETE_BATCH_SIZE):
+            still_free = db.and_(cls.id.in_(ids[start:start + cls.DELETE_BATCH_SIZE]), cls.status == 'Available')
+            db.session.execute(
+                db.update(Reservation).where(Reservation.spot_id.in_(db.select(cls.id).where(still_free)))
+                .values(spot_id=None).execution_options(synchronize_session=False)
+            )
+            deleted += db.session.execute(
+                db.delete(cls).where(still_free).execution_options(synchronize_session=False)
+            ).rowcount
+        return deleted
 
-    __table_args__ = (db.UniqueConstraint('lot_id', 'spot_number', name='_lot_spot_uc'),)
+    @classmethod
+    def next_available(cls, lot_id):
+        """First free spot of a lot in spot order, without claiming it."""
+        return cls.query.filter_by(lot_id=lot_id, status='Available').order_by(cls.spot_index).first()
+
+    @classmethod
+    def claim_next_available(cls, lot_id, status='Reserved'):
+        """Atomically flips the lot's first free spot to `status` and returns it, or None if the lot is full.
+
+        The claim is a single conditional UPDATE, so two concurrent bookers can never get the same
+        spot; a booker that loses the race simply retries on the next free spot. Caller commits.
+        """
+        for _ in range(cls.CLAIM_ATTEMPTS):
+            first_free = db.select(cls.id).where(
+                cls.lot_id == lot_id,
+                cls.status == 'Available'
+            ).order_by(cls.spot_index).limit(1).scalar_subquery()
+
+            claimed_id = db.session.execute(
+                db.update(cls)
+                .where(cls.id == first_free, cls.status == 'Available')
+                .values(status=status)
+                .returning(cls.id)
+                .execution_options(synchronize_session=False)
+            ).scalar()
+
+            if claimed_id is not None:
+                return db.session.get(cls, claimed_id, populate_existing=True)
+            if cls.next_available(lot_id) is None:
+                return None
+        return None
 
     def get_active_reservation(self):
         return self.spot_reservations.filter_by(status='active').first()
@@ -62,7 +258,143 @@ class Reservation(db.Model):
     total_cost = db.Column(db.Float, nullable=True)
     status = db.Column(db.String(20), default='pending', nullable=False)
 
+    __table_args__ = (
+        db.Index('ix_reservation_status', 'status'),
+        db.Index('ix_reservation_user_booking', 'user_id', 'booking_timestamp'),
+        db.Index('ix_reservation_user_status_checkout', 'user_id', 'status', 'check_out_timestamp'),
+        db.Index('ix_reservation_spot_status', 'spot_id', 'status'),
+        db.Index('ix_reservation_spot_booking', 'spot_id', 'booking_timestamp'),
+        db.Index('ix_reservation_open_vehicle', 'vehicle_number',
+                 sqlite_where=db.text("status IN ('pending', 'active')"),
+                 postgresql_where=db.text("status IN ('pending', 'active')")),
+    )
+
+    @classmethod
+    def is_open(cls):
+        """Filter for pending/active reservations.
+
+        The statuses are rendered inline rather than bound so SQLite can match the partial
+        ix_reservation_open_vehicle index.
+        """
+        return cls.status.in_(db.bindparam('open_statuses', list(OPEN_RESERVATION_STATUSES),
+                                           expanding=True, literal_execute=True, unique=True))
+
+    @classmethod
+    def counts_by_user(cls, user_ids):
+        """{user_id: {'total': n, 'pending': n, 'active': n, ...}} for `user_ids` from one grouped
+        query (an index-only scan of ix_reservation_user_status_checkout). Users without
+        reservations get all zeros."""
+        user_ids = list(user_ids)
+        counts = {user_id: dict.fromkeys(('total',) + RESERVATION_STATUSES, 0) for user_id in user_ids}
+        if not user_ids:
+            return counts
+        rows = db.session.query(cls.user_id, cls.status, db.func.count()).filter(
+            cls.user_id.in_(user_ids)).group_by(cls.user_id, cls.status)
+        for user_id, status, count in rows:
+            counts[user_id][status] = counts[user_id].get(status, 0) + count
+            counts[user_id]['total'] += count
+        return counts
+
     def __repr__(self):
         spot_info = self.parking_spot.spot_number if self.parking_spot else f"Deleted Spot (ID: {self.spot_id})"
         user_info = self.tenant.username if self.tenant else f"User ID: {self.user_id}"
-        return f'<Reservation {self.id} | Spot {spot_info} | User {user_info} | Status: {self.status}>'
\ No newline at end of file
+        return f'<Reservation {self.id} | Spot {spot_info} | User {user_info} | Status: {self.status}>'
+
+class DailyLotStats(db.Model):
+    """Per-lot, per-IST-day rollup of reservation activity used by the admin charts.
+
+    Bookings and cancellations are bucketed by booking day (no cancellation time is stored),
+    check-ins by check-in day, and completions/revenue/parked minutes by check-out day.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    lot_id = db.Column(db.Integer, db.ForeignKey('parking_lot.id', ondelete='SET NULL'), nullable=True)
+    day = db.Column(db.Date, nullable=False, index=True)
+    bookings = db.Column(db.Integer, default=0, nullable=False)
+    check_ins = db.Column(db.Integer, default=0, nullable=False)
+    completions = db.Column(db.Integer, default=0, nullable=False)
+    cancellations = db.Column(db.Integer, default=0, nullable=False)
+    revenue = db.Column(db.Float, default=0.0, nullable=False)
+    parked_minutes = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (db.UniqueConstraint('lot_id', 'day', name='_lot_day_uc'),)
+
+    COUNTERS = ('bookings', 'check_ins', 'completions', 'cancellations', 'revenue', 'parked_minutes')
+
+    @classmethod
+    def record(cls, lot_id, timestamp, **increments):
+        """Adds `increments` to the (lot, IST day of `timestamp`) row in the current transaction."""
+        day = to_ist_date(timestamp)
+        db.session.execute(cls._record_statement(db.session.get_bind().dialect.name, lot_id, day, increments))
+
+    @classmethod
+    def _record_statement(cls, dialect_name, lot_id, day, increments):
+        stmt = upsert(cls, dialect_name).values(lot_id=lot_id, day=day, **cls._zeroed(increments))
+        return stmt.on_conflict_do_update(
+            index_elements=['lot_id', 'day'],
+            set_={name: getattr(cls, name) + stmt.excluded[name] for name in increments}
+        )
+
+    @classmethod
+    def _zeroed(cls, increments):
+        values = dict.fromkeys(cls.COUNTERS, 0)
+        values.update(increments)
+        return values
+
+    @classmethod
+    def rebuild(cls):
+        """Recomputes the whole rollup from the reservation history. Caller commits."""
+        totals = {}
+
+        def collect(day_column, *where, **aggregates):
+            stmt = db.select(
+                ParkingSpot.lot_id, ist_date(day_column), *aggregates.values()
+            ).select_from(Reservation).outerjoin(
+                ParkingSpot, Reservation.spot_id == ParkingSpot.id
+            ).where(day_column.isnot(None), *where).group_by(ParkingSpot.lot_id, ist_date(day_column))
+            for row in db.session.execute(stmt):
+                values = totals.setdefault((row[0], row[1]), cls._zeroed({}))
+                for name, value in zip(aggregates, row[2:]):
+                    values[name] += value or 0
+
+        collect(Reservation.booking_timestamp, bookings=db.func.count(Reservation.id))
+        collect(Reservation.booking_timestamp, Reservation.status == 'cancelled',
+                cancellations=db.func.count(Reservation.id))
+        collect(Reservation.check_in_timestamp, check_ins=db.func.count(Reservation.id))
+        collect(Reservation.check_out_timestamp, Reservation.status == 'completed',
+                completions=db.func.count(Reservation.id),
+                revenue=db.func.sum(db.func.coalesce(Reservation.total_cost, 0.0)),
+                parked_minutes=db.func.sum(db.cast(db.func.round(
+                    minutes_between(Reservation.check_in_timestamp, Reservation.check_out_timestamp)
+                ), db.Integer)))
+
+        db.session.execute(db.delete(cls))
+        rows = [
+            dict(lot_id=lot, day=date.fromisoformat(day), **values)
+            for (lot, day), values in totals.items()
+        ]
+        if rows:
+            db.session.execute(db.insert(cls), rows)
+        return len(rows)
+
+class CacheVersion(db.Model):
+    """Named, monotonically increasing version counters for in-process caches.
+
+    Writers bump a counter in the same transaction as the change it covers; each worker compares
+    the stored version with the one its cache was built at, which costs a primary-key lookup.
+    """
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+
+    @classmethod
+    def bump(cls, name):
+        """Increments `name` in the current transaction."""
+        db.session.execute(cls._bump_statement(db.session.get_bind().dialect.name, name))
+
+    @classmethod
+    def _bump_statement(cls, dialect_name, name):
+        stmt = upsert(cls, dialect_name).values(name=name, version=1)
+        return stmt.on_conflict_do_update(index_elements=['name'], set_={'version': cls.version + 1})
+
+    @classmethod
+    def current(cls, name):
+        return db.session.execute(db.select(cls.version).where(cls.name == name)).scalar() or 0
@@ -0,0 +1,82 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from flask import current_app, request
+from sqlalchemy import DateTime, tuple_
+from sqlalchemy.engine import Row
+
+DEFAULT_PAGE_SIZE = 50
+
+class Page:
+    """One page of a keyset-paginated list."""
+
+    def __init__(self, items, next_cursor, is_first):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.is_first = is_first
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, columns):
+    """Returns the cursor's values typed for `columns`, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            return None
+        return [
+            datetime.fromisoformat(value) if isinstance(column.type, DateTime) else value
+            for column, value in zip(columns, values)
+        ]
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+def paginate(query, order_columns, descending=False, cursor_arg='after', per_page=None):
+    """Seek pagination: rows strictly after the `cursor_arg` request cursor, in `order_columns` order.
+
+    `order_columns` must end in a unique column so every row has a distinct position. Each page
+    costs one indexed range scan of `per_page + 1` rows, however deep the cursor is.
+
+    The query may select an entity plus extra ordering columns (e.g. a search rank); the page
+    then holds just the entities.
+    """
+    per_page = per_page or current_app.config.get('PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    cursor = decode_cursor(request.args.get(cursor_arg), order_columns)
+
+    if cursor is not None:
+        if len(order_columns) == 1:
+            key, bound = order_columns[0], cursor[0]
+        else:
+            key, bound = tuple_(*order_columns), tuple_(*cursor)
+        query = query.filter(key < bound if descending else key > bound)
+
+    ordering = [column.desc() if descending else column for column in order_columns]
+    rows = query.order_by(*ordering).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        next_cursor = encode_cursor([_order_value(rows[-1], column) for column in order_columns])
+    items = [row[0] if isinstance(row, Row) else row for row in rows]
+    return Page(items, next_cursor, is_first=cursor is None)
+
+def _order_value(row, column):
+    if isinstance(row, Row):
+        if column.key in row._fields:
+            return row._mapping[column.key]
+        row = row[0]
+    return getattr(row, column.key)
@@ -0,0 +1,70 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_WORKERS = 4
+DEFAULT_TIMEOUT = 5.0
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when a hash or check waited longer than PASSWORD_HASH_TIMEOUT for a free worker."""
+
+class PasswordHasher:
+    """Runs password hashing and verification on a bounded thread pool.
+
+    scrypt and pbkdf2 release the GIL, so request threads keep serving other pages while a
+    login burst hashes. At most `workers` hashes run at once, which caps the CPU a burst can
+    take. A call waits at most `timeout` seconds for one of those slots and then raises
+    PasswordHasherBusy without having queued any work; once started, a hash runs to the end.
+
+    `method` is Werkzeug's hash method string, e.g. 'scrypt:32768:8:1' or 'pbkdf2:sha256:600000'.
+    Hashes made with any other method are reported by `needs_rehash()`.
+    """
+
+    def __init__(self, method='scrypt', workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT):
+        self.method = method
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        # one slot per pool thread, so work that gets a slot starts at once
+        self._slots = threading.BoundedSemaphore(workers)
+        self._full_method = None
+        self._lock = threading.Lock()
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PasswordHasherBusy('Password hashing is saturated; try again shortly.')
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if `password_hash` was made with a different method or cost than configured."""
+        if self._full_method is None:
+            # Werkzeug fills in default cost parameters ('scrypt' -> 'scrypt:32768:8:1')
+            with self._lock:
+                if self._full_method is None:
+                    self._full_method = self.hash('').split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._full_method
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def make_password_hasher(config):
+    return PasswordHasher(
+        config.get('PASSWORD_HASH_METHOD') or 'scrypt',
+        config.get('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS),
+        config.get('PASSWORD_HASH_TIMEOUT', DEFAULT_TIMEOUT),
+    )
+
+def password_hasher():
+    return current_app.extensions['password_hasher']
@@ -0,0 +1,146 @@
+import itertools
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from flask import g, request
+
+PROFILE_SUFFIX = '.folded'
+
+def _frame_label(code, root_path):
+    filename = code.co_filename
+    if filename.startswith(root_path):
+        filename = filename[len(root_path):].lstrip(os.sep)
+    else:
+        filename = os.path.basename(filename)
+    # ';' separates frames in the folded format
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({filename}:{code.co_firstlineno})".replace(';', ':')
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval` seconds from a background thread.
+
+    Stacks are counted as root-to-leaf tuples of function labels; `folded()` renders them in
+    the collapsed-stack format ("frame;frame;frame count" per line) that flamegraph.pl,
+    speedscope and inferno read. While the sampled thread runs pure Python it only gives up
+    the GIL every sys.getswitchinterval() (5 ms by default), so CPU-bound stretches are
+    sampled at about that rate whatever `interval` is.
+    """
+
+    def __init__(self, thread_id, interval, root_path):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.root_path = root_path
+        self.counts = {}
+        self._stop = threading.Event()
+        self._labels = {}
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = _frame_label(code, self.root_path)
+        return label
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                stack = tuple(reversed(stack))
+                self.counts[stack] = self.counts.get(stack, 0) + 1
+
+    def folded(self):
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(self.counts.items()))
+
+class RequestProfiler:
+    """Profiles every `every`-th request and all requests to `endpoints`, one file per request.
+
+    Files are named `<UTC time>_<endpoint>_<duration>ms.folded`; only the newest `max_files`
+    are kept.
+    """
+
+    def __init__(self, directory, every=0, endpoints=(), interval=0.001, max_files=100, root_path=''):
+        self.directory = directory
+        self.every = every
+        self.endpoints = frozenset(endpoints)
+        self.interval = interval
+        self.max_files = max_files
+        self.root_path = root_path
+        self._requests = itertools.count(1)
+
+    @property
+    def enabled(self):
+        return bool(self.every or self.endpoints)
+
+    def wants(self, endpoint):
+        if endpoint in self.endpoints:
+            return True
+        return bool(self.every) and endpoint != 'static' and next(self._requests) % self.every == 0
+
+    def start(self):
+        sampler = StackSampler(threading.get_ident(), self.interval, self.root_path)
+        sampler.start()
+        return sampler
+
+    def finish(self, sampler, endpoint, elapsed):
+        sampler.stop()
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.utcnow().strftime('%Y%m%d-%H%M%S-%f')
+        name = f'{stamp}_{endpoint or "none"}_{elapsed * 1000:.0f}ms{PROFILE_SUFFIX}'
+        with open(os.path.join(self.directory, name), 'w', encoding='utf-8') as f:
+            f.write(sampler.folded())
+        self._prune()
+        return name
+
+    def _prune(self):
+        names = self.profile_names()
+        for name in names[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def profile_names(self):
+        """Saved profiles, newest first."""
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith(PROFILE_SUFFIX)]
+        except FileNotFoundError:
+            return []
+        return sorted(names, reverse=True)
+
+def make_request_profiler(app):
+    config = app.config
+    return RequestProfiler(config['PROFILE_DIR'], config['PROFILE_EVERY_N_REQUESTS'], config['PROFILE_ENDPOINTS'],
+                           config['PROFILE_INTERVAL_MS'] / 1000.0, config['PROFILE_MAX_FILES'], app.root_path)
+
+def init_profiling(app):
+    """Samples the stacks of the requests picked by PROFILE_EVERY_N_REQUESTS / PROFILE_ENDPOINTS.
+
+    With neither set no request hooks are installed at all, so unsampled traffic pays nothing.
+    """
+    app.extensions['request_profiler'] = profiler = make_request_profiler(app)
+    if not profiler.enabled:
+        return
+
+    @app.before_request
+    def start_profile():
+        if profiler.wants(request.endpoint):
+            g.profile = (profiler.start(), time.perf_counter())
+
+    @app.teardown_request
+    def finish_profile(exc):
+        profile = g.pop('profile', None)
+        if profile is not None:
+            sampler, started = profile
+            profiler.finish(sampler, request.endpoint, time.perf_counter() - started)
@@ -0,0 +1,82 @@
+import threading
+import time
+from functools import wraps
+from flask import current_app, request, Response
+from flask_login import current_user
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600}
+
+def parse_limit(limit):
+    """'10/minute' -> (burst, tokens per second): up to 10 at once, refilling at 10 a minute."""
+    count, _, period = limit.partition('/')
+    count = int(count)
+    return count, count / PERIODS[period.strip().rstrip('s') or 'second']
+
+class TokenBucketLimiter:
+    """In-memory token buckets, one `[tokens, last_refill]` pair per active key.
+
+    A key idle long enough to have refilled completely is indistinguishable from a new one, so
+    such buckets are swept every `sweep_interval` seconds; memory stays proportional to the
+    keys active within one refill period.
+    """
+
+    def __init__(self, sweep_interval=60):
+        self.sweep_interval = sweep_interval
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+    def allow(self, key, burst, rate):
+        """Takes one token from `key`'s bucket; returns 0 if allowed, else seconds until a token frees up."""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(burst), now, burst / rate]
+            else:
+                bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+                bucket[1] = now
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return 0
+            return (1 - bucket[0]) / rate
+
+    def _sweep(self, now):
+        # bucket[2] is how long the bucket takes to refill from empty
+        idle = [key for key, bucket in self._buckets.items() if now - bucket[1] >= bucket[2]]
+        for key in idle:
+            del self._buckets[key]
+        self._next_sweep = now + self.sweep_interval
+
+    def __len__(self):
+        return len(self._buckets)
+
+def client_key():
+    return f'ip:{request.remote_addr}'
+
+def user_key():
+    return f'user:{current_user.id}' if current_user.is_authenticated else client_key()
+
+def rate_limit(config_key, key=client_key, methods=None):
+    """Limits a view to the app config's `config_key` limit (e.g. '10/minute') per `key()`.
+
+    Over-limit requests get a bare 429 before the view runs, so they cost no database or
+    hashing work. `methods` restricts the limit to those HTTP methods.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            limit = current_app.config.get(config_key)
+            if limit and current_app.config.get('RATELIMIT_ENABLED', True) and (
+                    methods is None or request.method in methods):
+                burst, rate = parse_limit(limit)
+                retry_after = current_app.extensions['rate_limiter'].allow(
+                    f'{request.endpoint}:{key()}', burst, rate)
+                if retry_after:
+                    return Response('Too many requests, please slow down.\n', 429,
+                                    {'Retry-After': str(int(retry_after) + 1)}, mimetype='text/plain')
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
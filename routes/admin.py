@@ -1,14 +1,21 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, abort, send_from_directory
 from flask_login import current_user, login_required
 from functools import wraps
 from forms import ParkingLotForm
-from models import db, ParkingLot, ParkingSpot, User, Reservation 
+from pagination import paginate
+from search import lot_index, user_index
+from autocomplete import bump_lot_suggestions, index_lot, unindex_lot
+from profiling import PROFILE_SUFFIX
+from availability import bump_availability
+from models import db, ParkingLot, ParkingSpot, User, Reservation, DailyLotStats, IST, ist_date
 from datetime import datetime, timedelta
 from sqlalchemy import func, or_
+import os
 import pytz 
 
 bp = Blueprint('admin', __name__)
-IST = pytz.timezone('Asia/Kolkata')
+# Day ranges offered for the revenue and booking charts
+CHART_RANGES = (7, 30, 90)
 
 def admin_required(f):
     @wraps(f)
@@ -24,74 +31,55 @@ def admin_required(f):
 @admin_required
 def dashboard():
     lots = ParkingLot.query.order_by(ParkingLot.name).all()
-    
-    total_spots = int(ParkingSpot.query.count() or 0)
-    occupied_spots_overall = int(ParkingSpot.query.filter_by(status='Occupied').count() or 0)
-    reserved_spots_overall = int(ParkingSpot.query.filter_by(status='Reserved').count() or 0)
-    available_spots_overall = total_spots - occupied_spots_overall - reserved_spots_overall
-    
+
+    # Spot totals come from the per-lot counters, no extra query needed
+    occupied_spots_overall = sum(lot.occupied_spots for lot in lots)
+    reserved_spots_overall = sum(lot.reserved_spots for lot in lots)
+    available_spots_overall = sum(lot.available_spots for lot in lots)
+    total_spots = occupied_spots_overall + reserved_spots_overall + available_spots_overall
+
     registered_users = int(User.query.filter_by(is_admin=False).count() or 0)
 
     current_lots = lots if lots else []
 
     # Reservation Status Breakdown
-    pending_reservations = Reservation.query.filter_by(status='pending').count()
-    active_reservations = Reservation.query.filter_by(status='active').count()
-    completed_reservations = Reservation.query.filter_by(status='completed').count()
-    cancelled_reservations = Reservation.query.filter_by(status='cancelled').count()
+    status_counts = dict(
+        db.session.query(Reservation.status, func.count(Reservation.id)).group_by(Reservation.status).all()
+    )
+    pending_reservations = status_counts.get('pending', 0)
+    active_reservations = status_counts.get('active', 0)
+    completed_reservations = status_counts.get('completed', 0)
+    cancelled_reservations = status_counts.get('cancelled', 0)
+
+    chart_days = request.args.get('days', CHART_RANGES[0], type=int)
+    if chart_days not in CHART_RANGES:
+        chart_days = CHART_RANGES[0]
 
-    # Daily Bookings 7 days
-    daily_reservation_labels = []
-    daily_reservation_counts = []
-    
     # UTC to IST
     now_utc = datetime.utcnow().replace(tzinfo=pytz.utc)
     now_ist = now_utc.astimezone(IST)
     today_ist = now_ist.date() 
+    chart_dates_ist = [today_ist - timedelta(days=i) for i in range(chart_days - 1, -1, -1)]
 
-    for i in range(6, -1, -1): 
-        date_ist = today_ist - timedelta(days=i)
-        daily_reservation_labels.append(date_ist.strftime('%b %d'))
-        
-        start_of_ist_day_utc = IST.localize(datetime(date_ist.year, date_ist.month, date_ist.day, 0, 0, 0)).astimezone(pytz.utc)
-        end_of_ist_day_utc = IST.localize(datetime(date_ist.year, date_ist.month, date_ist.day, 23, 59, 59)).astimezone(pytz.utc)
-
-        count = db.session.query(Reservation).filter(
-            Reservation.booking_timestamp >= start_of_ist_day_utc,
-            Reservation.booking_timestamp <= end_of_ist_day_utc
-        ).count()
-        daily_reservation_counts.append(count)
+    # Daily bookings and revenue, read from the per-lot daily rollup
+    daily_totals = {
+        day: (bookings, revenue)
+        for day, bookings, revenue in db.session.query(
+            DailyLotStats.day, func.sum(DailyLotStats.bookings), func.sum(DailyLotStats.revenue)
+        ).filter(DailyLotStats.day >= chart_dates_ist[0]).group_by(DailyLotStats.day)
+    }
 
-    # Revenue chart
+    daily_reservation_labels = []
+    daily_reservation_counts = []
     daily_revenue_labels = []
     daily_revenue_amounts = []
-    
-    daily_revenue_map = {}
-    for i in range(6, -1, -1):
-        date_ist = today_ist - timedelta(days=i)
-        display_label = date_ist.strftime('%b %d')
-        daily_revenue_labels.append(display_label)
-        daily_revenue_map[date_ist.strftime('%Y-%m-%d')] = 0.0
-
-    seven_days_ago_ist = today_ist - timedelta(days=7)
-    start_of_period_utc = IST.localize(datetime(seven_days_ago_ist.year, seven_days_ago_ist.month, seven_days_ago_ist.day, 0, 0, 0)).astimezone(pytz.utc)
-
-    recent_completed_reservations = Reservation.query.filter(
-        Reservation.status == 'completed',
-        Reservation.check_out_timestamp >= start_of_period_utc
-    ).all()
-
-    for res in recent_completed_reservations:
-        if res.total_cost is not None and res.check_out_timestamp:
-            checkout_timestamp_ist = res.check_out_timestamp.replace(tzinfo=pytz.utc).astimezone(IST)
-            checkout_date_ist_str = checkout_timestamp_ist.strftime('%Y-%m-%d')
-            
-            if checkout_date_ist_str in daily_revenue_map:
-                daily_revenue_map[checkout_date_ist_str] += res.total_cost
-
-    for date_str in sorted(daily_revenue_map.keys()):
-        daily_revenue_amounts.append(round(daily_revenue_map[date_str], 2))
 
+    for date_ist in chart_dates_ist:
+        bookings, revenue = daily_totals.get(date_ist, (0, 0.0))
+        daily_reservation_labels.append(date_ist.strftime('%b %d'))
+        daily_reservation_counts.append(int(bookings or 0))
+        daily_revenue_labels.append(date_ist.strftime('%b %d'))
+        daily_revenue_amounts.append(round(revenue or 0.0, 2))
 
     return render_template('admin/dashboard.html', 
                            title='Admin Dashboard',
@@ -108,13 +96,55 @@ def dashboard():
                            daily_reservation_labels=daily_reservation_labels,
                            daily_reservation_counts=daily_reservation_counts,
                            daily_revenue_labels=daily_revenue_labels,
-                           daily_revenue_amounts=daily_revenue_amounts)
+                           daily_revenue_amounts=daily_revenue_amounts,
+                           chart_days=chart_days,
+                           chart_ranges=CHART_RANGES)
+
+@bp.route('/sql_stats', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def sql_stats():
+    stats = current_app.extensions.get('sql_stats')
+    if request.method == 'POST' and stats is not None:
+        stats.reset()
+        flash('SQL statistics have been reset.', 'success')
+        return redirect(url_for('admin.sql_stats'))
+    return render_template('admin/sql_stats.html',
+                           title='SQL Stats',
+                           stats=stats,
+                           routes=stats.route_rows() if stats else [],
+                           statements=stats.slowest_statements() if stats else [],
+                           since=datetime.fromtimestamp(stats.since) if stats else None,
+                           slow_query_ms=current_app.config.get('SLOW_QUERY_MS'))
+
+@bp.route('/profiles')
+@login_required
+@admin_required
+def list_profiles():
+    profiler = current_app.extensions['request_profiler']
+    profiles = []
+    for name in profiler.profile_names():
+        try:
+            stat = os.stat(os.path.join(profiler.directory, name))
+        except OSError:
+            continue
+        profiles.append({'name': name, 'size': stat.st_size, 'created': datetime.fromtimestamp(stat.st_mtime)})
+    return render_template('admin/profiles.html', title='Request Profiles', profiles=profiles, profiler=profiler)
+
+@bp.route('/profiles/<name>')
+@login_required
+@admin_required
+def download_profile(name):
+    if not name.endswith(PROFILE_SUFFIX):
+        abort(404)
+    return send_from_directory(current_app.extensions['request_profiler'].directory, name,
+                               as_attachment=True, mimetype='text/plain')
 
 @bp.route('/parking_lots')
 @login_required
 @admin_required
 def list_parking_lots():
-    lots = ParkingLot.query.order_by(ParkingLot.name).all()
+    lots = paginate(ParkingLot.query, [ParkingLot.name])
     return render_template('admin/list_parking_lots.html', lots=lots, title='Manage Parking Lots')
 
 @bp.route('/search', methods=['GET'])
@@ -129,32 +159,44 @@ def search_all():
     
     if not search_term:
         if search_category == "users":
-            users_found = User.query.order_by(User.username).all()
+            users_found = paginate(User.query, [User.username])
         elif (search_category == "lots" or search_category == "pincode"):
-            lots_found = ParkingLot.query.order_by(ParkingLot.name).all()
+            lots_found = paginate(ParkingLot.query, [ParkingLot.name])
 
     elif search_term and search_category:
         search_pattern = f"%{search_term}%"
 
         if search_category == 'users':
-            users_found = User.query.filter(
-                or_(
-                    User.username.ilike(search_pattern),
-                    User.email.ilike(search_pattern),
-                    User.full_name.ilike(search_pattern)
-                )
-            ).order_by(User.username).all()
+            matches = user_index.search(search_term)
+            if matches is not None:
+                users_found = paginate(matches, [user_index.rank, User.id])
+            else:
+                users_found = paginate(User.query.filter(
+                    or_(
+                        User.username.ilike(search_pattern),
+                        User.email.ilike(search_pattern),
+                        User.full_name.ilike(search_pattern)
+                    )
+                ), [User.username])
 
         elif search_category == 'lots':
-            lots_found = ParkingLot.query.filter(
-                or_(
-                    ParkingLot.name.ilike(search_pattern),
-                    ParkingLot.address.ilike(search_pattern)
-                )
-            ).order_by(ParkingLot.name).all()
+            matches = lot_index.search(search_term, ['name', 'address'])
+            if matches is not None:
+                lots_found = paginate(matches, [lot_index.rank, ParkingLot.id])
+            else:
+                lots_found = paginate(ParkingLot.query.filter(
+                    or_(
+                        ParkingLot.name.ilike(search_pattern),
+                        ParkingLot.address.ilike(search_pattern)
+                    )
+                ), [ParkingLot.name])
 
         elif search_category == 'pincode':
-            lots_found = ParkingLot.query.filter(ParkingLot.pin_code.ilike(search_pattern)).order_by(ParkingLot.name).all()
+            matches = lot_index.search(search_term, ['pin_code'])
+            if matches is not None:
+                lots_found = paginate(matches, [lot_index.rank, ParkingLot.id])
+            else:
+                lots_found = paginate(ParkingLot.query.filter(ParkingLot.pin_code.ilike(search_pattern)), [ParkingLot.name])
 
     return render_template('admin/search_results.html',
                            title=f"Search Results for '{search_term}'",
@@ -175,17 +217,18 @@ def create_parking_lot():
             pin_code=form.pin_code.data,
             price_per_hour=form.price_per_hour.data,
             maximum_capacity=form.maximum_capacity.data,
-            is_active=True
+            is_active=True,
+            available_spots=form.maximum_capacity.data
         )
         db.session.add(new_lot)
         db.session.flush()
 
-        for i in range(1, form.maximum_capacity.data + 1):
-            spot_number = f"S{i:03d}" 
-            spot = ParkingSpot(spot_number=spot_number, lot_id=new_lot.id, status='Available')
-            db.session.add(spot)
+        ParkingSpot.bulk_create(new_lot.id, 1, form.maximum_capacity.data)
+        bump_availability()
+        bump_lot_suggestions()
         
         db.session.commit()
+        index_lot(new_lot)
         flash(f'Parking lot \'{new_lot.name}\' created successfully with {new_lot.maximum_capacity} spots!', 'success')
         return redirect(url_for('admin.list_parking_lots'))
     return render_template('admin/create_edit_parking_lot.html', form=form, title='Create Parking Lot', legend='New Parking Lot') 
@@ -209,42 +252,28 @@ def edit_parking_lot(lot_id):
         
         if new_capacity > original_capacity:
             add_spots = new_capacity - original_capacity
-            last_present_spot = db.session.query(func.max(ParkingSpot.spot_number)).filter_by(lot_id=lot.id).scalar()
-            
-            start_from_number = 1
-            if last_present_spot:
-                try:
-                    numeric_part = int(last_present_spot.lstrip('AS')) 
-                    start_from_number = numeric_part + 1
-                except (ValueError, TypeError):
-                    print(f"Warning: Could not parse spot number '{last_present_spot}'. Starting new spots from S001.")
-
-            for i in range(start_from_number, start_from_number + add_spots):
-                spot_number = f"S{i:03d}" 
-                spot = ParkingSpot(spot_number=spot_number, lot_id=lot.id, status='Available')
-                db.session.add(spot)
+            ParkingSpot.bulk_create(lot.id, ParkingSpot.next_index(lot.id), add_spots)
+            lot.adjust_spot_counts(to_status='Available', count=add_spots)
             flash(f'Capacity increased. {add_spots} new spots added.', 'success')
 
         elif new_capacity < original_capacity:
             delete_spots = original_capacity - new_capacity
 
-            spots_to_delete = ParkingSpot.query.filter(
-                ParkingSpot.lot_id == lot.id,
-                ParkingSpot.status == 'Available',
-                ~ParkingSpot.spot_reservations.any(Reservation.status.in_(['pending', 'active']))
-            ).order_by(ParkingSpot.spot_number.desc()).limit(delete_spots).all()
+            deleted_spots = ParkingSpot.bulk_delete_free(lot.id, delete_spots)
 
-            if len(spots_to_delete) < delete_spots:
-                flash(f'Cannot reduce capacity by {delete_spots} spots. Only {len(spots_to_delete)} truly available spots can be removed. Please ensure spots are free and have no active or pending reservations.', 'danger')
+            if deleted_spots < delete_spots:
                 db.session.rollback()
+                flash(f'Cannot reduce capacity by {delete_spots} spots. Only {deleted_spots} truly available spots can be removed. Please ensure spots are free and have no active or pending reservations.', 'danger')
                 return redirect(url_for('admin.edit_parking_lot', lot_id=lot.id)) 
             else:
-                for spot_to_delete in spots_to_delete:
-                    db.session.delete(spot_to_delete)
+                lot.adjust_spot_counts(from_status='Available', count=delete_spots)
                 flash(f'Reduced capacity. {delete_spots} spots removed.', 'info')
 
         lot.maximum_capacity = new_capacity
+        bump_availability()
+        bump_lot_suggestions()
         db.session.commit()
+        index_lot(lot)
         flash(f'Parking lot \'{lot.name}\' updated successfully!', 'success')
         return redirect(url_for('admin.list_parking_lots'))
 
@@ -274,8 +303,14 @@ def delete_parking_lot(lot_id):
         return redirect(url_for('admin.list_parking_lots')) 
 
     lot_name = lot.name
+    lot_id = lot.id
+    # Keep the lot's history in the rollup totals once the lot itself is gone
+    DailyLotStats.query.filter_by(lot_id=lot.id).update({DailyLotStats.lot_id: None})
     db.session.delete(lot)
+    bump_availability()
+    bump_lot_suggestions()
     db.session.commit()
+    unindex_lot(lot_id)
     flash(f'Parking lot \'{lot_name}\' and its spots have been deleted.', 'success')
     return redirect(url_for('admin.list_parking_lots')) 
 
@@ -284,7 +319,7 @@ def delete_parking_lot(lot_id):
 @admin_required
 def view_lot_spots(lot_id):
     lot = ParkingLot.query.get_or_404(lot_id)
-    spots = lot.spots.order_by(ParkingSpot.spot_number).all()
+    spots = lot.spots.order_by(ParkingSpot.spot_index).all()
     
     return render_template('admin/view_lot_spots.html', 
                            lot=lot, 
@@ -311,9 +346,9 @@ def view_spot_details(spot_id):
     current_time_ist_str = datetime.utcnow().replace(tzinfo=pytz.utc).astimezone(IST).strftime('%Y-%m-%d %H:%M:%S (IST)')
 
     # Reservation history for spot
-    all_spot_reservations = spot.spot_reservations.order_by(Reservation.booking_timestamp.desc()).all()
+    history_page = paginate(spot.spot_reservations, [Reservation.booking_timestamp, Reservation.id], descending=True)
     reservations_history_for_template = []
-    for res in all_spot_reservations:
+    for res in history_page:
         booking_ist_str = res.booking_timestamp.replace(tzinfo=pytz.utc).astimezone(IST).strftime('%Y-%m-%d %H:%M (IST)')
         check_in_ist_str = None
         if res.check_in_timestamp:
@@ -339,7 +374,8 @@ def view_spot_details(spot_id):
                              title=f'Details for Spot {spot.spot_number}', 
                              parked_at_ist_str=parked_at_ist_str, 
                              current_time_ist_str=current_time_ist_str, 
-                             reservations_history=reservations_history_for_template) 
+                             reservations_history=reservations_history_for_template,
+                             history_page=history_page) 
 
 
 @bp.route('/spot/delete/<int:spot_id>', methods=['POST'])
@@ -362,6 +398,8 @@ def delete_spot(spot_id):
         return redirect(url_for('admin.view_lot_spots', lot_id=lot.id)) 
     spot_number_deleted = spot.spot_number
     db.session.delete(spot)
+    lot.adjust_spot_counts(from_status=spot.status)
+    bump_availability()
     
     if lot.maximum_capacity > 0:
         lot.maximum_capacity -= 1
@@ -375,8 +413,10 @@ def delete_spot(spot_id):
 @login_required
 @admin_required
 def list_users():
-    users = User.query.order_by(User.username).all()
-    return render_template('admin/list_users.html', users=users, title='Registered Users')
+    users = paginate(User.query, [User.username])
+    reservation_counts = Reservation.counts_by_user(user.id for user in users)
+    return render_template('admin/list_users.html', users=users, reservation_counts=reservation_counts,
+                           title='Registered Users')
 
 
 @bp.route('/user_details/<int:user_id>')
@@ -384,7 +424,7 @@ def list_users():
 @admin_required
 def user_details(user_id):
     user = User.query.get_or_404(user_id)
-    reservations = user.reservations.order_by(Reservation.booking_timestamp.desc()).all()
+    reservations = paginate(user.reservations, [Reservation.booking_timestamp, Reservation.id], descending=True)
     
     reservations_for_template = []
     for res in reservations:
@@ -411,5 +451,7 @@ def user_details(user_id):
 
     return render_template('admin/user_details.html', 
                              user=user, 
+                             reservation_counts=Reservation.counts_by_user([user.id])[user.id],
                              reservations=reservations_for_template,
+                             reservations_page=reservations,
                              title=f'Details for {user.full_name}')
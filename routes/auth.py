@@ -5,10 +5,12 @@ from werkzeug.security import generate_password_hash, check_password_hash
 
 from forms import LoginForm, RegistrationForm
 from models import User, db
+from ratelimit import rate_limit
 
 bp = Blueprint('auth', __name__, url_prefix='/auth')
 
 @bp.route('/login', methods=['GET', 'POST'])
+@rate_limit('RATELIMIT_LOGIN', methods=('POST',))
 def login():
     if current_user.is_authenticated:
         if current_user.is_admin:
@@ -22,6 +24,11 @@ def login():
             flash('Invalid username or password', 'danger')
             return redirect(url_for('auth.login'))
         
+        if user.password_needs_rehash():
+            # Upgrade hashes made under an older method/cost while the plain password is at hand
+            user.set_password(form.password.data)
+            db.session.commit()
+
         login_user(user, remember=form.remember_me.data)
         flash(f'Welcome, {user.full_name}!', 'success')
         
@@ -42,6 +49,7 @@ def logout():
     return redirect(url_for('main.index'))
 
 @bp.route('/register', methods=['GET', 'POST'])
+@rate_limit('RATELIMIT_REGISTER', methods=('POST',))
 def register():
     if current_user.is_authenticated:
         return redirect(url_for('main.index'))
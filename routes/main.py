@@ -1,6 +1,8 @@
-from flask import Blueprint, render_template, redirect, url_for, flash
+import hmac
+from flask import Blueprint, render_template, redirect, url_for, flash, current_app, request, abort, Response
 from flask_login import current_user
 from models import db
+from metrics import render, CONTENT_TYPE
 
 bp = Blueprint('main', __name__)
 
@@ -12,4 +14,13 @@ def index():
             return redirect(url_for('admin.dashboard'))
         else:
             return redirect(url_for('user.dashboard'))
-    return render_template('index.html')
\ No newline at end of file
+    return render_template('index.html')
+
+@bp.route('/metrics')
+def metrics():
+    if 'metrics' not in current_app.extensions:
+        abort(404)
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+    return Response(render(current_app.config['METRICS_DIR']), mimetype=CONTENT_TYPE)
@@ -1,9 +1,17 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify
 from flask_login import current_user, login_required
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, time
 from forms import BookSpotForm, CheckInForm, ParkOutForm, EditProfileForm, ChangePasswordForm 
-from models import ParkingLot, ParkingSpot, User, Reservation, db
-from sqlalchemy import or_ 
+from models import ParkingLot, ParkingSpot, User, Reservation, DailyLotStats, db, ist_date
+from pagination import paginate
+from search import lot_index
+from autocomplete import lot_suggestions
+from availability import lot_availability, bump_availability
+from user_cache import invalidate_user
+from passwords import PasswordHasherBusy
+from ratelimit import rate_limit, user_key
+from metrics import BOOKINGS, CHECK_INS, PARK_OUTS, CANCELLATIONS, BOOKING_FAILURES
+from sqlalchemy import func, or_ 
 from werkzeug.security import generate_password_hash, check_password_hash 
 import pytz 
 bp = Blueprint('user', __name__)
@@ -15,49 +23,62 @@ IST = pytz.timezone('Asia/Kolkata')
 def dashboard():
     search_term = request.form.get('search_term') if request.method == 'POST' else request.args.get('search_term')
     
+    lots = lot_availability()
+
     if search_term:
-        search_pattern = f"%{search_term}%"
-        parking_lots = ParkingLot.query.filter(
-            or_(
-                ParkingLot.name.ilike(search_pattern),
-                ParkingLot.address.ilike(search_pattern),
-                ParkingLot.pin_code.ilike(search_pattern)
-            )
-        ).order_by(ParkingLot.name).all()
+        matches = lot_index.search(search_term)
+        if matches is not None:
+            lot_ids = matches.with_entities(ParkingLot.id).order_by(lot_index.rank, ParkingLot.id)
+        else:
+            search_pattern = f"%{search_term}%"
+            lot_ids = db.session.query(ParkingLot.id).filter(
+                or_(
+                    ParkingLot.name.ilike(search_pattern),
+                    ParkingLot.address.ilike(search_pattern),
+                    ParkingLot.pin_code.ilike(search_pattern)
+                )
+            ).order_by(ParkingLot.name)
+        parking_lots = [lots[lot_id] for lot_id, in lot_ids if lot_id in lots]
         if not parking_lots:
             flash(f"No parking lots found matching '{search_term}'.", 'info')
     else:
-        parking_lots = ParkingLot.query.order_by(ParkingLot.name).all()
+        parking_lots = list(lots.values())
     
-    user_reservations_raw = Reservation.query.filter(
-        Reservation.user_id == current_user.id,
-        Reservation.status.in_(['pending', 'active', 'completed', 'cancelled'])
-    ).order_by(Reservation.booking_timestamp.desc()).all()
-
-    user_reservations_table = []
     has_active_or_pending_reservation = False
     current_user_reservation_detail = None 
 
-    for res in user_reservations_raw:
-        if res.status in ['pending', 'active'] and not current_user_reservation_detail:
-            has_active_or_pending_reservation = True
-            booking_ist_str = res.booking_timestamp.replace(tzinfo=pytz.utc).astimezone(IST).strftime('%Y-%m-%d %H:%M (IST)')
-            check_in_ist_str = None
-            if res.check_in_timestamp:
-                check_in_ist_str = res.check_in_timestamp.replace(tzinfo=pytz.utc).astimezone(IST).strftime('%Y-%m-%d %H:%M (IST)')
-            
-            current_user_reservation_detail = {
-                'id': res.id,
-                'parking_lot_name': res.parking_spot.parking_lot.name if res.parking_spot and res.parking_spot.parking_lot else 'N/A',
-                'spot_number': res.parking_spot.spot_number if res.parking_spot else 'N/A',
-                'vehicle_number': res.vehicle_number,
-                'booking_timestamp_ist_str': booking_ist_str,
-                'check_in_timestamp_ist_str': check_in_ist_str,
-                'status': res.status,
-                'total_cost': res.total_cost, # none for active/pending
-                'res_object': res 
-            }
+    current_reservation = Reservation.query.filter(
+        Reservation.user_id == current_user.id,
+        Reservation.is_open()
+    ).order_by(Reservation.booking_timestamp.desc()).first()
+
+    if current_reservation:
+        res = current_reservation
+        has_active_or_pending_reservation = True
+        booking_ist_str = res.booking_timestamp.replace(tzinfo=pytz.utc).astimezone(IST).strftime('%Y-%m-%d %H:%M (IST)')
+        check_in_ist_str = None
+        if res.check_in_timestamp:
+            check_in_ist_str = res.check_in_timestamp.replace(tzinfo=pytz.utc).astimezone(IST).strftime('%Y-%m-%d %H:%M (IST)')
+        
+        current_user_reservation_detail = {
+            'id': res.id,
+            'parking_lot_name': res.parking_spot.parking_lot.name if res.parking_spot and res.parking_spot.parking_lot else 'N/A',
+            'spot_number': res.parking_spot.spot_number if res.parking_spot else 'N/A',
+            'vehicle_number': res.vehicle_number,
+            'booking_timestamp_ist_str': booking_ist_str,
+            'check_in_timestamp_ist_str': check_in_ist_str,
+            'status': res.status,
+            'total_cost': res.total_cost, # none for active/pending
+            'res_object': res 
+        }
+
+    user_reservations_page = paginate(Reservation.query.filter(
+        Reservation.user_id == current_user.id,
+        Reservation.status.in_(['pending', 'active', 'completed', 'cancelled'])
+    ), [Reservation.booking_timestamp, Reservation.id], descending=True)
 
+    user_reservations_table = []
+    for res in user_reservations_page:
         booking_ist_str_for_table = res.booking_timestamp.replace(tzinfo=pytz.utc).astimezone(IST).strftime('%Y-%m-%d %H:%M (IST)')
         check_in_ist_str_for_table = None
         if res.check_in_timestamp:
@@ -82,51 +103,60 @@ def dashboard():
     check_in_form = CheckInForm() 
     park_out_form = ParkOutForm()
 
-    completed_reservations = Reservation.query.filter_by(
-        user_id=current_user.id,
-        status='completed'
-    ).order_by(Reservation.check_out_timestamp.desc()).all()
-
-    # last 10 completed parkings
-    parking_cost_chart_data = []
-    for res in completed_reservations[:10]: 
-        if res.total_cost is not None and res.check_out_timestamp:
-            checkout_ist_str = res.check_out_timestamp.replace(tzinfo=pytz.utc).astimezone(IST).strftime('%Y-%m-%d')
-            parking_cost_chart_data.append([checkout_ist_str, res.total_cost])
-    parking_cost_chart_data.reverse()
+    # last 10 completed parkings; also the basis of the most-visited chart
+    recent_completed = db.select(
+        Reservation.id, Reservation.spot_id, Reservation.check_out_timestamp, Reservation.total_cost
+    ).where(
+        Reservation.user_id == current_user.id,
+        Reservation.status == 'completed'
+    ).order_by(Reservation.check_out_timestamp.desc()).limit(10).subquery()
+
+    parking_cost_chart_data = [
+        [checkout_ist_str, total_cost]
+        for checkout_ist_str, total_cost in db.session.execute(
+            db.select(ist_date(recent_completed.c.check_out_timestamp), recent_completed.c.total_cost).where(
+                recent_completed.c.total_cost.isnot(None),
+                recent_completed.c.check_out_timestamp.isnot(None)
+            ).order_by(recent_completed.c.check_out_timestamp)
+        )
+    ]
 
     # Frequency of last 7 days
-    parking_frequency_data = {}
-    today_utc = datetime.utcnow().date()
     today_ist = datetime.utcnow().replace(tzinfo=pytz.utc).astimezone(IST).date()
+    start_of_period_utc = IST.localize(datetime.combine(today_ist - timedelta(days=6), time.min)).astimezone(pytz.utc).replace(tzinfo=None)
 
+    checkout_day = ist_date(Reservation.check_out_timestamp)
+    completions_by_day = dict(
+        db.session.query(checkout_day, func.count(Reservation.id)).filter(
+            Reservation.user_id == current_user.id,
+            Reservation.status == 'completed',
+            Reservation.check_out_timestamp >= start_of_period_utc
+        ).group_by(checkout_day).all()
+    )
+
+    parking_frequency_data = {}
     for i in range(7):
-        date_ist = today_ist - timedelta(days=i)
-        parking_frequency_data[date_ist.strftime('%Y-%m-%d')] = 0
-    
-    for res in completed_reservations:
-        if res.check_out_timestamp:
-            checkout_date_ist = res.check_out_timestamp.replace(tzinfo=pytz.utc).astimezone(IST).date()
-            if (today_ist - checkout_date_ist).days < 7:
-                date_str = checkout_date_ist.strftime('%Y-%m-%d')
-                parking_frequency_data[date_str] = parking_frequency_data.get(date_str, 0) + 1
+        date_str = (today_ist - timedelta(days=i)).strftime('%Y-%m-%d')
+        parking_frequency_data[date_str] = completions_by_day.get(date_str, 0)
     
     parking_frequency_chart_data = sorted(parking_frequency_data.items())
 
-    # 3. Most Visited Lots since 10 days 
-    most_visited_lots_raw = {}
-    for res in completed_reservations[:10]:
-        if res.parking_spot and res.parking_spot.parking_lot:
-            lot_name = res.parking_spot.parking_lot.name
-            most_visited_lots_raw[lot_name] = most_visited_lots_raw.get(lot_name, 0) + 1
-    
-    most_visited_lots_data = list(most_visited_lots_raw.items())
-
+    # 3. Most Visited Lots over the last 10 completed parkings
+    most_visited_lots_data = [
+        (lot_name, visits)
+        for lot_name, visits in db.session.query(ParkingLot.name, func.count(recent_completed.c.id))
+        .select_from(recent_completed)
+        .join(ParkingSpot, ParkingSpot.id == recent_completed.c.spot_id)
+        .join(ParkingLot, ParkingLot.id == ParkingSpot.lot_id)
+        .group_by(ParkingLot.id, ParkingLot.name)
+        .order_by(func.count(recent_completed.c.id).desc(), ParkingLot.name)
+    ]
 
     return render_template('user/dashboard.html', 
                            title='User Dashboard',
                            parking_lots=parking_lots,
                            user_reservations_table=user_reservations_table,
+                           user_reservations_page=user_reservations_page,
                            has_active_or_pending_reservation=has_active_or_pending_reservation,
                            current_user_reservation_detail=current_user_reservation_detail, 
                            book_form=book_form,
@@ -137,20 +167,37 @@ def dashboard():
                            parking_frequency_data=parking_frequency_chart_data,
                            most_visited_lots_data=most_visited_lots_data)
 
+@bp.route('/autocomplete')
+@login_required
+def autocomplete():
+    prefix = request.args.get('q', '')
+    return jsonify(suggestions=lot_suggestions().suggest(prefix))
+
 @bp.route('/book_spot/<int:lot_id>', methods=['GET', 'POST'])
 @login_required
+@rate_limit('RATELIMIT_BOOKING', key=user_key)
 def book_spot(lot_id):
     lot = ParkingLot.query.get_or_404(lot_id)
     form = BookSpotForm()
 
-    available_spot = ParkingSpot.query.filter_by(lot_id=lot.id, status='Available').order_by(ParkingSpot.spot_number).first()
+    available_spot = ParkingSpot.next_available(lot.id)
 
     if not available_spot:
+        if request.method == 'POST':
+            BOOKING_FAILURES.inc(reason='no_free_spot')
         flash(f'No available spots found in {lot.name} at the moment. Please try another lot or wait for a spot to clear.', 'danger')
         return redirect(url_for('user.dashboard'))
 
     if form.validate_on_submit():
         try:
+            # The previewed spot may have been taken meanwhile; claim whichever spot is free now
+            available_spot = ParkingSpot.claim_next_available(lot.id)
+            if not available_spot:
+                db.session.rollback()
+                BOOKING_FAILURES.inc(reason='no_free_spot')
+                flash(f'No available spots found in {lot.name} at the moment. Please try another lot or wait for a spot to clear.', 'danger')
+                return redirect(url_for('user.dashboard'))
+
             new_reservation = Reservation(
                 user_id=current_user.id,
                 spot_id=available_spot.id, 
@@ -158,10 +205,13 @@ def book_spot(lot_id):
                 booking_timestamp=datetime.utcnow(),
                 status='pending' 
             )
-            available_spot.status = 'Reserved' 
+            lot.adjust_spot_counts('Available', 'Reserved')
+            bump_availability()
+            DailyLotStats.record(lot.id, new_reservation.booking_timestamp, bookings=1)
             
             db.session.add(new_reservation)
             db.session.commit()
+            BOOKINGS.inc()
             
             flash(f'Spot {available_spot.spot_number} in {lot.name} has been successfully reserved for vehicle {form.vehicle_number.data}! Please check in when you arrive.', 'success')
             return redirect(url_for('user.dashboard')) 
@@ -199,8 +249,12 @@ def check_in_reservation(reservation_id):
         reservation.check_in_timestamp = datetime.utcnow() 
         
         spot.status = 'Occupied' 
+        spot.parking_lot.adjust_spot_counts('Reserved', 'Occupied')
+        bump_availability()
+        DailyLotStats.record(spot.lot_id, reservation.check_in_timestamp, check_ins=1)
         
         db.session.commit()
+        CHECK_INS.inc()
         flash(f'Successfully checked into spot {spot.spot_number}!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -280,9 +334,11 @@ def park_out_action(reservation_id):
     try:
         reservation.check_out_timestamp = datetime.utcnow()
         
+        parked_minutes = 0
         if reservation.check_in_timestamp:
             duration = reservation.check_out_timestamp - reservation.check_in_timestamp
             duration_hours = duration.total_seconds() / 3600.0
+            parked_minutes = int(round(duration.total_seconds() / 60.0))
             
             charged_hours = max(1.0, round(duration_hours))
             reservation.total_cost = charged_hours * parking_lot.price_per_hour
@@ -292,8 +348,13 @@ def park_out_action(reservation_id):
             
         reservation.status = 'completed' 
         spot.status = 'Available' 
+        parking_lot.adjust_spot_counts('Occupied', 'Available')
+        bump_availability()
+        DailyLotStats.record(parking_lot.id, reservation.check_out_timestamp,
+                             completions=1, revenue=reservation.total_cost, parked_minutes=parked_minutes)
         
         db.session.commit()
+        PARK_OUTS.inc()
         
         flash(f'Successfully parked out from spot {spot.spot_number}. Your parking cost is ₹{reservation.total_cost:.2f}.', 'success')
     except Exception as e:
@@ -322,8 +383,12 @@ def cancel_reservation(reservation_id):
         
         if spot.status == 'Reserved' and spot.id == reservation.spot_id:
             spot.status = 'Available'
+            spot.parking_lot.adjust_spot_counts('Reserved', 'Available')
+            bump_availability()
+        DailyLotStats.record(spot.lot_id, reservation.booking_timestamp, cancellations=1)
         
         db.session.commit()
+        CANCELLATIONS.inc()
         flash(f'Reservation for spot {spot.spot_number} has been cancelled.', 'info')
     except Exception as e:
         db.session.rollback()
@@ -346,6 +411,7 @@ def edit_profile():
             current_user.username = form.username.data
             current_user.email = form.email.data
             current_user.full_name = form.full_name.data 
+            invalidate_user(current_user.id)
             db.session.commit()
             flash('Your profile has been updated successfully!', 'success')
             if current_user.is_admin:
@@ -366,12 +432,16 @@ def change_password():
     if form.validate_on_submit():
         try:
             current_user.set_password(form.new_password.data)
+            invalidate_user(current_user.id)
             db.session.commit()
             flash('Your password has been changed successfully!', 'success')
             if current_user.is_admin:              
                 return redirect(url_for('admin.dashboard'))
             else:
                 return redirect(url_for('user.dashboard'))
+        except PasswordHasherBusy:
+            db.session.rollback()
+            raise  # answered with 503 by the app's error handler
         except Exception as e:
             db.session.rollback()
             flash(f'An error occurred while changing your password: {e}', 'danger')
@@ -0,0 +1,50 @@
+from sqlalchemy import column, table, text
+from models import db, ParkingLot, User
+
+class FullTextIndex:
+    """An FTS5 trigram index kept in sync with `model` by the triggers from the migration.
+
+    Trigrams match any substring of 3+ characters, case-insensitively, like the `ilike('%term%')`
+    searches they replace. `search()` returns None when the index can't serve a term (FTS5
+    unavailable, or a term shorter than a trigram) so callers can fall back to LIKE.
+    """
+    MIN_TERM_LENGTH = 3
+
+    def __init__(self, model, table_name, columns):
+        self.model = model
+        self.table_name = table_name
+        self.columns = columns
+        self.fts = table(table_name, column('rowid'), column('rank'), column(table_name))
+        self._available = {}
+
+    @property
+    def rank(self):
+        """bm25 relevance; lower is more relevant."""
+        return self.fts.c.rank
+
+    def available(self):
+        engine = db.engine
+        if engine.url not in self._available:
+            found = False
+            if engine.dialect.name == 'sqlite':
+                found = db.session.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                    {'name': self.table_name}
+                ).first() is not None
+            self._available[engine.url] = found
+        return self._available[engine.url]
+
+    def search(self, term, columns=None):
+        """Query of (model, rank) rows matching `term` in `columns`, unordered; or None to fall back."""
+        term = (term or '').strip()
+        if len(term) < self.MIN_TERM_LENGTH or not self.available():
+            return None
+        columns = columns or self.columns
+        phrase = '"' + term.replace('"', '""') + '"'
+        match = '{' + ' '.join(columns) + '} : ' + phrase
+        return db.session.query(self.model, self.rank).join(
+            self.fts, self.fts.c.rowid == self.model.id
+        ).filter(self.fts.c[self.table_name].op('MATCH')(match))
+
+lot_index = FullTextIndex(ParkingLot, 'parking_lot_fts', ('name', 'address', 'pin_code'))
+user_index = FullTextIndex(User, 'user_fts', ('username', 'email', 'full_name'))
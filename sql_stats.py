@@ -0,0 +1,140 @@
+import heapq
+from functools import lru_cache
+import logging
+import re
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+SLOWEST_PER_REQUEST = 3
+WHITESPACE = re.compile(r'\s+')
+
+@lru_cache(maxsize=1024)
+def _one_line(statement):
+    return WHITESPACE.sub(' ', statement).strip()
+
+class RequestQueries:
+    """SQL done while serving one request: statement count, DB time and the slowest statements."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest = []  # min-heap of (ms, statement), at most SLOWEST_PER_REQUEST long
+
+    def add(self, statement, ms):
+        self.count += 1
+        self.total_ms += ms
+        if len(self.slowest) < SLOWEST_PER_REQUEST:
+            heapq.heappush(self.slowest, (ms, statement))
+        elif ms > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (ms, statement))
+
+class SqlStats:
+    """Per-route SQL totals for this process, plus the slowest statements seen.
+
+    Route rows hold requests, total and maximum statements per request and total DB time.
+    Statements are keyed by their SQL text (parameters are never recorded) and capped at
+    `max_statements` distinct ones; once full, only statements already tracked are updated.
+    """
+
+    def __init__(self, max_statements=200):
+        self.max_statements = max_statements
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.routes = {}
+            self.statements = {}
+            self.since = time.time()
+
+    def record(self, route, queries):
+        with self._lock:
+            row = self.routes.setdefault(route, {'requests': 0, 'queries': 0, 'max_queries': 0, 'db_ms': 0.0})
+            row['requests'] += 1
+            row['queries'] += queries.count
+            row['max_queries'] = max(row['max_queries'], queries.count)
+            row['db_ms'] += queries.total_ms
+            for ms, statement in queries.slowest:
+                stats = self.statements.get(statement)
+                if stats is None:
+                    if len(self.statements) >= self.max_statements:
+                        continue
+                    stats = self.statements[statement] = {'max_ms': 0.0, 'route': route}
+                if ms >= stats['max_ms']:
+                    stats.update(max_ms=ms, route=route)
+
+    def route_rows(self):
+        """(route, stats) pairs, most total DB time first."""
+        with self._lock:
+            rows = [(route, dict(row)) for route, row in self.routes.items()]
+        return sorted(rows, key=lambda item: item[1]['db_ms'], reverse=True)
+
+    def slowest_statements(self, limit=20):
+        with self._lock:
+            rows = [(statement, dict(stats)) for statement, stats in self.statements.items()]
+        return sorted(rows, key=lambda item: item[1]['max_ms'], reverse=True)[:limit]
+
+def current_route():
+    if not has_request_context():
+        return 'cli'
+    return request.endpoint or request.path
+
+def _slow_query_log(path, max_bytes, backups):
+    # Deliberately not from logging.getLogger(): a startup migration's logging.config.fileConfig()
+    # disables every registered logger, and two apps in one process must not share a file.
+    log = logging.Logger('slow_queries', logging.WARNING)
+    handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, delay=True)
+    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    log.addHandler(handler)
+    return log
+
+def init_sql_stats(app, engine):
+    """Times every statement on `engine` and reports per-request totals.
+
+    Statements slower than SLOW_QUERY_MS go to the rotating SLOW_QUERY_LOG with the route
+    that ran them. Each response gets X-DB-Queries / X-DB-Time-Ms / X-DB-Slowest-Ms headers
+    when SQL_STATS_HEADERS is set (default: in debug mode only).
+    """
+    if not app.config.get('SQL_STATS_ENABLED'):
+        return
+    threshold = app.config.get('SLOW_QUERY_MS')
+    slow_query_log = None
+    if threshold is not None and app.config.get('SLOW_QUERY_LOG'):
+        slow_query_log = _slow_query_log(app.config['SLOW_QUERY_LOG'], app.config['SLOW_QUERY_LOG_MAX_BYTES'],
+                                         app.config['SLOW_QUERY_LOG_BACKUPS'])
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        context._sql_stats_started = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_sql_stats_started', None)
+        if started is None:
+            return
+        ms = (time.perf_counter() - started) * 1000
+        statement = _one_line(statement)
+        if has_request_context():
+            queries = g.get('sql_queries')
+            if queries is None:
+                queries = g.sql_queries = RequestQueries()
+            queries.add(statement, ms)
+        if slow_query_log is not None and ms >= threshold:
+            slow_query_log.warning('%.1f ms %s: %s', ms, current_route(), statement)
+
+    app.extensions['sql_stats'] = stats = SqlStats()
+
+    @app.after_request
+    def record_sql_stats(response):
+        queries = g.pop('sql_queries', None) or RequestQueries()
+        if request.endpoint != 'static':
+            stats.record(current_route(), queries)
+        headers = app.config.get('SQL_STATS_HEADERS')
+        if headers or (headers is None and app.debug):
+            response.headers['X-DB-Queries'] = str(queries.count)
+            response.headers['X-DB-Time-Ms'] = f'{queries.total_ms:.2f}'
+            response.headers['X-DB-Slowest-Ms'] = f'{max(queries.slowest)[0]:.2f}' if queries.slowest else '0'
+        return response
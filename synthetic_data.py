@@ -0,0 +1,177 @@
+import random
+from datetime import datetime, timedelta
+from models import db, User, ParkingLot, ParkingSpot, Reservation, DailyLotStats
+from availability import bump_availability
+from autocomplete import bump_lot_suggestions
+from passwords import password_hasher
+
+BATCH_SIZE = 10000
+USERNAME_PREFIX = 'synth'
+LOT_NAME_PREFIX = 'Synthetic Lot'
+
+STREETS = ('MG Road', 'Residency Road', 'Brigade Road', 'Linking Road', 'Park Street', 'Anna Salai',
+           'Mall Road', 'Station Road', 'Ring Road', 'Church Street', 'Hill Road', 'Lake View Road')
+CITIES = ('Bengaluru', 'Mumbai', 'Chennai', 'Kolkata', 'Delhi', 'Hyderabad', 'Pune', 'Jaipur')
+FIRST_NAMES = ('Aarav', 'Diya', 'Kabir', 'Meera', 'Rohan', 'Ananya', 'Vikram', 'Isha', 'Arjun', 'Kavya')
+LAST_NAMES = ('Sharma', 'Iyer', 'Reddy', 'Patel', 'Singh', 'Gupta', 'Nair', 'Das', 'Khan', 'Mehta')
+STATE_CODES = ('KA', 'MH', 'TN', 'WB', 'DL', 'TS', 'RJ', 'KL')
+
+def _batches(rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _insert(model, rows):
+    """Executemany INSERTs of `rows` (any iterable of dicts with the same keys) in BATCH_SIZE chunks.
+
+    On SQLite the rows go to the driver as plain tuples: SQLAlchemy's per-value bind
+    processing costs more than the INSERT itself at a million rows. Datetimes are written in
+    the text format SQLAlchemy's SQLite dialect uses, so they compare like any other row's.
+    """
+    table = model.__table__
+    connection = db.session.connection()
+    if connection.dialect.name != 'sqlite':
+        for batch in _batches(rows):
+            connection.execute(table.insert(), batch)
+        return
+
+    quote = connection.dialect.identifier_preparer.quote
+    for batch in _batches(rows):
+        columns = list(batch[0])
+        stamps = [i for i, name in enumerate(columns) if isinstance(table.c[name].type, db.DateTime)]
+        values = []
+        for row in batch:
+            row = [row[name] for name in columns]
+            for i in stamps:
+                if row[i] is not None:
+                    row[i] = row[i].isoformat(' ', 'microseconds')
+            values.append(tuple(row))
+        connection.exec_driver_sql(
+            f'INSERT INTO {quote(table.name)} ({", ".join(map(quote, columns))}) '
+            f'VALUES ({", ".join("?" * len(columns))})', values)
+
+def _vehicle_number(serial):
+    return f'{STATE_CODES[serial % len(STATE_CODES)]}{serial % 99 + 1:02d}{chr(65 + serial % 26)}{serial:06d}'
+
+def generate(lots=50, users=1000, reservations=100000, min_capacity=20, max_capacity=200,
+             months=6, seed=42, password='password123', end=None):
+    """Adds a deterministic synthetic dataset and returns the row counts written. Caller commits.
+
+    The same seed and `end` (the newest booking time, default: now) always give the same rows.
+    Users are `synth_user000001`... plus an admin `synth_admin`, all sharing `password`. About
+    2% of reservations are still open (pending/active) and hold their spots; the rest are
+    completed or cancelled, spread over the `months` before `end`. `synth_user000001` has no
+    open reservation. Spot counters and the daily stats rollup are recomputed at the end.
+    """
+    if User.query.filter(User.username.like(f'{USERNAME_PREFIX}\\_%', escape='\\')).first() is not None:
+        raise ValueError('This database already has synthetic users; start from a fresh database.')
+
+    rng = random.Random(seed)
+    end = end or datetime.utcnow().replace(microsecond=0)
+    window = timedelta(days=30 * months).total_seconds()
+    password_hash = password_hasher().hash(password)
+
+    _insert(User, [{
+        'username': f'{USERNAME_PREFIX}_admin', 'full_name': 'Synthetic Admin',
+        'email': f'{USERNAME_PREFIX}_admin@example.com', 'password_hash': password_hash, 'is_admin': True,
+    }])
+    _insert(User, ({
+        'username': f'{USERNAME_PREFIX}_user{i:06d}',
+        'full_name': f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+        'email': f'{USERNAME_PREFIX}_user{i:06d}@example.com',
+        'password_hash': password_hash,
+        'is_admin': False,
+    } for i in range(1, users + 1)))
+    user_ids = db.session.execute(
+        db.select(User.id).where(User.username.like(f'{USERNAME_PREFIX}\\_user%', escape='\\')).order_by(User.id)
+    ).scalars().all()
+
+    capacities = [rng.randint(min_capacity, max_capacity) for _ in range(lots)]
+    _insert(ParkingLot, ({
+        'name': f'{LOT_NAME_PREFIX} {i:05d}',
+        'address': f'{rng.randint(1, 400)} {rng.choice(STREETS)}, {rng.choice(CITIES)}',
+        'pin_code': f'{700000 + i}',
+        'price_per_hour': float(rng.choice((10, 20, 25, 30, 40, 50, 60))),
+        'maximum_capacity': capacity,
+        'is_active': True,
+        'available_spots': capacity,
+        'reserved_spots': 0,
+        'occupied_spots': 0,
+    } for i, capacity in enumerate(capacities, start=1)))
+    lot_rows = db.session.execute(
+        db.select(ParkingLot.id, ParkingLot.price_per_hour)
+        .where(ParkingLot.name.like(f'{LOT_NAME_PREFIX} %')).order_by(ParkingLot.id)
+    ).all()
+
+    for (lot_id, _), capacity in zip(lot_rows, capacities):
+        ParkingSpot.bulk_create(lot_id, 1, capacity)
+    price_by_lot = dict(lot_rows)
+    spots = db.session.execute(
+        db.select(ParkingSpot.id, ParkingSpot.lot_id)
+        .where(ParkingSpot.lot_id.in_(list(price_by_lot))).order_by(ParkingSpot.id)
+    ).all()
+
+    # Open reservations: each holds a distinct spot and belongs to a distinct user. The first
+    # user never gets one, so it can always book (the route benchmark logs in as it).
+    open_count = min(reservations // 50, len(spots) // 2, len(user_ids) - 1)
+    open_spots = rng.sample(spots, open_count)
+    open_users = rng.sample(user_ids[1:], open_count)
+    spot_updates = []
+
+    def open_rows():
+        for serial, ((spot_id, _), user_id) in enumerate(zip(open_spots, open_users), start=1):
+            booked = end - timedelta(minutes=rng.randint(5, 600))
+            active = rng.random() < 0.5
+            spot_updates.append({'spot': spot_id, 'new_status': 'Occupied' if active else 'Reserved'})
+            yield {
+                'spot_id': spot_id, 'user_id': user_id, 'vehicle_number': _vehicle_number(serial),
+                'booking_timestamp': booked,
+                'check_in_timestamp': booked + timedelta(minutes=rng.randint(1, 30)) if active else None,
+                'check_out_timestamp': None, 'total_cost': None,
+                'status': 'active' if active else 'pending',
+            }
+
+    def past_rows():
+        for serial in range(open_count + 1, reservations + 1):
+            spot_id, lot_id = spots[int(rng.random() * len(spots))]
+            booked = end - timedelta(seconds=3600 + rng.random() * (window - 3600))
+            row = {
+                'spot_id': spot_id, 'user_id': user_ids[int(rng.random() * len(user_ids))],
+                'vehicle_number': _vehicle_number(serial), 'booking_timestamp': booked,
+                'check_in_timestamp': None, 'check_out_timestamp': None, 'total_cost': None,
+                'status': 'cancelled',
+            }
+            if rng.random() < 0.85:
+                checked_in = booked + timedelta(minutes=1 + int(rng.random() * 30))
+                parked = timedelta(minutes=20 + int(rng.random() * 581))
+                row.update(status='completed', check_in_timestamp=checked_in, check_out_timestamp=checked_in + parked,
+                           total_cost=max(1.0, round(parked.total_seconds() / 3600.0)) * price_by_lot[lot_id])
+            yield row
+
+    # Building the reservation indexes once after the load is far cheaper than updating
+    # them row by row in random key order
+    connection = db.session.connection()
+    for index in Reservation.__table__.indexes:
+        index.drop(connection)
+    _insert(Reservation, open_rows())
+    _insert(Reservation, past_rows())
+    for index in Reservation.__table__.indexes:
+        index.create(connection)
+    if spot_updates:
+        db.session.execute(
+            db.update(ParkingSpot.__table__)
+            .where(ParkingSpot.__table__.c.id == db.bindparam('spot'))
+            .values(status=db.bindparam('new_status')),
+            spot_updates
+        )
+
+    ParkingLot.recount_spots(list(price_by_lot))
+    DailyLotStats.rebuild()
+    bump_availability()
+    bump_lot_suggestions()
+    return {'users': len(user_ids) + 1, 'lots': len(lot_rows), 'spots': len(spots), 'reservations': reservations}
@@ -0,0 +1,53 @@
+import os
+import pytest
+
+os.environ.setdefault('SECRET_KEY', 'test-secret-key')
+
+from app import create_app
+from models import db
+
+TEST_CONFIG = {
+    'TESTING': True,
+    'WTF_CSRF_ENABLED': False,
+    'RATELIMIT_ENABLED': False,
+    'SLOW_QUERY_LOG': None,
+    'CACHE_TYPE': 'lru',
+    # cheap hashes; the cost is what PASSWORD_HASH_METHOD is for, not what these tests check
+    'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+}
+
+@pytest.fixture(scope='session')
+def make_app(tmp_path_factory):
+    """Builds an app on its own scratch SQLite database (migrated to head); keyword arguments
+    override config keys."""
+    apps = []
+
+    def make_app(**overrides):
+        directory = tmp_path_factory.mktemp('app')
+        config = dict(TEST_CONFIG,
+                      SQLALCHEMY_DATABASE_URI=f"sqlite:///{directory / 'app.db'}",
+                      METRICS_DIR=str(directory / 'metrics'),
+                      PROFILE_DIR=str(directory / 'profiles'))
+        config.update(overrides)
+        app = create_app(type('TestConfig', (), config))
+        apps.append(app)
+        return app
+
+    yield make_app
+    for app in apps:
+        with app.app_context():
+            db.engine.dispose()
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+@pytest.fixture(scope='session')
+def login():
+    def login(app, username, password):
+        client = app.test_client()
+        response = client.post('/auth/login', data={'username': username, 'password': password})
+        assert response.status_code == 302 and 'login' not in response.headers['Location'], \
+            f"could not log in as '{username}'"
+        return client
+    return login
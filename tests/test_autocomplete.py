@@ -0,0 +1,85 @@
+import time
+from collections import namedtuple
+from sqlalchemy import event
+from autocomplete import LotSuggestions
+from models import db, User
+
+LOT_FORM = {'name': 'Riverside Plaza', 'address': 'Canal Road', 'pin_code': '400001', 'price_per_hour': 20,
+            'maximum_capacity': 5}
+Lot = namedtuple('Lot', 'id name address pin_code')
+
+def suggestions(client, prefix):
+    return [lot['name'] for lot in client.get(f'/user/autocomplete?q={prefix}').get_json()['suggestions']]
+
+def eventually(client, prefix, expected, timeout=5.0):
+    """Suggestions once they match `expected`; other workers pick up changes in the background."""
+    deadline = time.monotonic() + timeout
+    while (names := suggestions(client, prefix)) != expected and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return names
+
+def add_users(app):
+    with app.app_context():
+        admin = User(username='admin', full_name='Admin', email='admin@example.com', is_admin=True)
+        admin.set_password('password123')
+        user = User(username='driver', full_name='Driver', email='driver@example.com')
+        user.set_password('password123')
+        db.session.add_all([admin, user])
+        db.session.commit()
+
+def test_other_workers_see_lot_changes(make_app, login):
+    # two apps on one database stand in for two worker processes
+    first = make_app()
+    second = make_app(SQLALCHEMY_DATABASE_URI=first.config['SQLALCHEMY_DATABASE_URI'], LOT_SUGGESTIONS_CHECK_SECONDS=0)
+    add_users(first)
+
+    admin = login(first, 'admin', 'password123')
+    reader = login(second, 'driver', 'password123')
+    assert suggestions(reader, 'river') == []
+
+    assert admin.post('/admin/parking_lot/new', data=LOT_FORM).status_code == 302
+    assert eventually(reader, 'river', ['Riverside Plaza']) == ['Riverside Plaza']
+
+    assert admin.post('/admin/parking_lot/edit/1', data=dict(LOT_FORM, name='Harbour Point')).status_code == 302
+    assert eventually(reader, 'harb', ['Harbour Point']) == ['Harbour Point']
+    assert suggestions(reader, 'river') == []
+
+    assert admin.post('/admin/parking_lot/delete/1').status_code == 302
+    assert eventually(reader, 'harb', []) == []
+
+def test_own_lot_changes_show_at_once(app, login):
+    add_users(app)
+    admin = login(app, 'admin', 'password123')
+    assert suggestions(admin, 'river') == []
+    admin.post('/admin/parking_lot/new', data=LOT_FORM)
+    assert suggestions(admin, 'river') == ['Riverside Plaza']
+
+def test_warm_request_runs_no_sql(app, login):
+    add_users(app)
+    client = login(app, 'driver', 'password123')
+    suggestions(client, 'ab')
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        suggestions(client, 'ab')
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert statements == []
+
+def test_sync_applies_only_the_changes():
+    index = LotSuggestions()
+    kept = Lot(1, 'Kept Lot', 'Main Road', '400001')
+    edited = Lot(2, 'Old Name', 'Side Street', '400002')
+    dropped = Lot(3, 'Gone Lot', 'Back Lane', '400003')
+    index.load([kept, edited, dropped], 1)
+    index.sync([kept, edited._replace(name='New Name'), Lot(4, 'Fresh Lot', 'Main Road', '400004')], 2)
+
+    assert [lot['name'] for lot in index.suggest('main')] == ['Kept Lot', 'Fresh Lot']
+    assert [lot['name'] for lot in index.suggest('new')] == ['New Name']
+    assert index.suggest('old') == [] and index.suggest('gone') == []
+    assert index._entries == sorted(index._entries)
+    assert index.version == 2
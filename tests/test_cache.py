@@ -0,0 +1,51 @@
+import pickle
+import socket
+import pytest
+from cache import CacheServer, MemcachedCache
+
+@pytest.fixture
+def server():
+    server = CacheServer('localhost:0').start()
+    yield server
+    server.close()
+
+def raw_set(address, key, data):
+    host, _, port = address.rpartition(':')
+    with socket.create_connection((host, int(port))) as sock:
+        sock.sendall(b'set %s 0 0 %d\r\n%s\r\n' % (key, len(data), data))
+        assert sock.makefile('rb').readline() == b'STORED\r\n'
+
+def test_round_trip(server):
+    cache = MemcachedCache(server.address, 'secret')
+    cache.set('lots:1', {1: ('Alpha', 3)})
+    assert cache.get('lots:1') == {1: ('Alpha', 3)}
+    cache.delete('lots:1')
+    assert cache.get('lots:1') is None
+
+class Exploit:
+    ran = False
+
+    def __reduce__(self):
+        return (setattr, (Exploit, 'ran', True))
+
+def test_unsigned_value_is_never_unpickled(server):
+    raw_set(server.address, b'user:1', pickle.dumps(Exploit()))
+    assert MemcachedCache(server.address, 'secret').get('user:1') is None
+    assert not Exploit.ran
+
+def test_value_signed_with_another_key_is_ignored(server):
+    MemcachedCache(server.address, 'other secret').set('user:1', {'is_admin': True})
+    assert MemcachedCache(server.address, 'secret').get('user:1') is None
+
+def test_value_copied_to_another_key_is_ignored(server):
+    cache = MemcachedCache(server.address, 'secret')
+    cache.set('user:1', {'id': 1, 'is_admin': True})
+    host, _, port = server.address.rpartition(':')
+    with socket.create_connection((host, int(port))) as sock:
+        sock.sendall(b'get user:1\r\n')
+        reader = sock.makefile('rb')
+        size = int(reader.readline().split()[3])
+        data = reader.read(size)
+    raw_set(server.address, b'user:2', data)
+    assert cache.get('user:2') is None
+    assert cache.get('user:1') == {'id': 1, 'is_admin': True}
@@ -0,0 +1,58 @@
+from datetime import date, datetime
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateIndex
+from models import db, CacheVersion, DailyLotStats, ParkingLot, Reservation, ist_date, minutes_between
+
+def compiled(dialect):
+    checkout = ist_date(Reservation.check_out_timestamp)
+    stmt = db.select(checkout, minutes_between(Reservation.check_in_timestamp, Reservation.check_out_timestamp)
+                     ).group_by(checkout)
+    return str(stmt.compile(dialect=dialect))
+
+def test_sqlite_expressions():
+    sql = compiled(sqlite.dialect())
+    assert 'date(reservation.check_out_timestamp, ?)' in sql
+    assert 'julianday(reservation.check_out_timestamp) - julianday(reservation.check_in_timestamp)' in sql
+
+def test_postgresql_expressions():
+    sql = compiled(postgresql.dialect())
+    day = "to_char(reservation.check_out_timestamp + INTERVAL '330 minutes', 'YYYY-MM-DD')"
+    assert sql.count(day) == 2  # GROUP BY repeats the select expression verbatim
+    assert 'EXTRACT(EPOCH FROM (reservation.check_out_timestamp - reservation.check_in_timestamp)) / 60' in sql
+    assert 'julianday' not in sql and 'date(' not in sql
+
+def test_ist_date_buckets_utc_timestamps_into_ist_days(app):
+    with app.app_context():
+        late_utc = db.session.execute(db.select(ist_date(db.literal(datetime(2025, 3, 1, 19, 0))))).scalar()
+        early_utc = db.session.execute(db.select(ist_date(db.literal(datetime(2025, 3, 1, 18, 0))))).scalar()
+    assert (early_utc, late_utc) == ('2025-03-01', '2025-03-02')
+
+def test_postgresql_upserts():
+    dialect = postgresql.dialect()
+    record = str(DailyLotStats._record_statement('postgresql', 1, date(2025, 3, 1), {'bookings': 1})
+                 .compile(dialect=dialect))
+    assert record.startswith('INSERT INTO daily_lot_stats')
+    assert 'ON CONFLICT (lot_id, day) DO UPDATE SET bookings = (daily_lot_stats.bookings + excluded.bookings)' in record
+    bump = str(CacheVersion._bump_statement('postgresql', 'lot_availability').compile(dialect=dialect))
+    assert 'ON CONFLICT (name) DO UPDATE SET version = (cache_version.version + %(version_1)s' in bump
+
+def test_first_writers_race_on_one_row(app):
+    # the upsert must create the row once and add to it afterwards, never insert it twice
+    with app.app_context():
+        lot = ParkingLot(name='Upsert Lot', address='Upsert Road', pin_code='560001', price_per_hour=10.0,
+                         maximum_capacity=1)
+        db.session.add(lot)
+        db.session.flush()
+        for _ in range(3):
+            CacheVersion.bump('race')
+            DailyLotStats.record(lot.id, datetime(2025, 3, 1, 12, 0), bookings=1, revenue=2.5)
+        db.session.commit()
+        assert CacheVersion.current('race') == 3
+        row = DailyLotStats.query.filter_by(day=date(2025, 3, 1)).one()
+        assert (row.bookings, row.revenue) == (3, 7.5)
+
+def test_open_vehicle_index_is_partial_on_both_databases():
+    index = next(index for index in Reservation.__table__.indexes if index.name == 'ix_reservation_open_vehicle')
+    for dialect in (sqlite.dialect(), postgresql.dialect()):
+        sql = str(CreateIndex(index).compile(dialect=dialect))
+        assert sql.endswith("WHERE status IN ('pending', 'active')"), sql
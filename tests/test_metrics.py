@@ -0,0 +1,57 @@
+import json
+import os
+import subprocess
+import sys
+from metrics import AGGREGATE_FILE, BOOKINGS, REQUESTS_IN_FLIGHT, MetricValues, collect
+
+IN_FLIGHT = REQUESTS_IN_FLIGHT._key({'endpoint': 'user.dashboard'})
+
+def record_in_child(directory, bookings):
+    """Records `bookings` and one in-flight request from a process that then exits; returns its pid."""
+    script = (f'from metrics import MetricValues\n'
+              f'values = MetricValues({str(directory)!r})\n'
+              f'values.add({BOOKINGS.name!r}, {bookings})\n'
+              f'values.add({IN_FLIGHT!r})\n'
+              f'import os; print(os.getpid())\n')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return int(subprocess.run([sys.executable, '-c', script], cwd=root, check=True,
+                              capture_output=True, text=True).stdout)
+
+def test_exited_workers_are_folded_into_the_aggregate(tmp_path):
+    pids = [record_in_child(tmp_path, 2), record_in_child(tmp_path, 3)]
+    live = MetricValues(str(tmp_path))
+    live.add(BOOKINGS.name, 5)
+    live.add(IN_FLIGHT)
+
+    totals = collect(str(tmp_path))
+    assert totals[BOOKINGS.name] == 10
+    assert totals[IN_FLIGHT] == 1
+    names = sorted(os.listdir(tmp_path))
+    assert AGGREGATE_FILE in names
+    assert not any(name.startswith(tuple(f'{pid}' for pid in pids)) for name in names)
+
+    # a second scrape neither loses nor re-adds what was folded
+    live.add(BOOKINGS.name)
+    assert collect(str(tmp_path))[BOOKINGS.name] == 11
+
+def test_dead_file_already_in_the_aggregate_is_not_counted_twice(tmp_path):
+    record_in_child(tmp_path, 4)
+    assert collect(str(tmp_path))[BOOKINGS.name] == 4
+    # as if that fold had died after replacing the aggregate but before deleting the renamed file
+    (folded,) = json.loads((tmp_path / AGGREGATE_FILE).read_text(encoding='utf-8'))['merged']
+    leftover = record_in_child(tmp_path, 4)
+    os.replace(tmp_path / f'{leftover}.db', tmp_path / folded)
+
+    assert collect(str(tmp_path))[BOOKINGS.name] == 4
+    assert not (tmp_path / folded).exists()
+    assert json.loads((tmp_path / AGGREGATE_FILE).read_text(encoding='utf-8'))['merged'] == [folded]
+
+def test_reused_pid_keeps_counters_and_zeroes_gauges(tmp_path):
+    child = record_in_child(tmp_path, 2)
+    os.replace(tmp_path / f'{child}.db', tmp_path / f'{os.getpid()}.db')
+
+    values = MetricValues(str(tmp_path))
+    values.add(BOOKINGS.name)
+    totals = collect(str(tmp_path))
+    assert totals[BOOKINGS.name] == 3
+    assert totals[IN_FLIGHT] == 0
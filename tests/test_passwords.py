@@ -0,0 +1,38 @@
+import threading
+import time
+import pytest
+from models import db, User
+from passwords import PasswordHasher, PasswordHasherBusy
+
+def test_timeout_only_limits_the_wait_to_start():
+    hasher = PasswordHasher('pbkdf2:sha256:1000', workers=1, timeout=0.2)
+    results = []
+    slow = threading.Thread(target=lambda: results.append(hasher._run(lambda: time.sleep(0.6) or 'done')))
+    slow.start()
+    time.sleep(0.05)
+
+    started = time.perf_counter()
+    with pytest.raises(PasswordHasherBusy):
+        hasher.hash('password')
+    assert time.perf_counter() - started < 0.5
+
+    slow.join()
+    assert results == ['done']  # ran past the timeout, but had started in time
+    assert hasher.verify(hasher.hash('password'), 'password')
+    hasher.shutdown()
+
+def test_change_password_answers_busy_with_503(app, login, monkeypatch):
+    with app.app_context():
+        user = User(username='driver', full_name='Driver', email='driver@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+    client = login(app, 'driver', 'password123')
+
+    def busy(password):
+        raise PasswordHasherBusy('saturated')
+    monkeypatch.setattr(app.extensions['password_hasher'], 'hash', busy)
+    response = client.post('/user/change_password', data={
+        'current_password': 'password123', 'new_password': 'changed123', 'confirm_new_password': 'changed123'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '2'
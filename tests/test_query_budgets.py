@@ -0,0 +1,38 @@
+"""No route may issue more SQL statements on a larger dataset (an N+1 query).
+
+`flask check-query-budgets` runs the same comparison from the command line.
+"""
+import pytest
+from benchmarks import QUERY_BUDGET_DATASETS, query_budget_regressions, query_budget_run
+
+ROUTES = [
+    'admin.dashboard', 'admin.dashboard ?days=90', 'admin.sql_stats', 'admin.list_profiles',
+    'admin.list_parking_lots', 'admin.search lots', 'admin.search users', 'admin.search pincode',
+    'admin.search all users', 'admin.create_parking_lot GET', 'admin.edit_parking_lot GET',
+    'admin.view_lot_spots', 'admin.view_spot_details', 'admin.list_users', 'admin.user_details',
+    'user.dashboard', 'user.dashboard search', 'user.autocomplete', 'user.book_spot GET',
+    'user.edit_profile GET', 'user.change_password GET', 'user.book_spot POST',
+    'user.check_in_reservation', 'user.park_out_page', 'user.park_out_action', 'user.cancel_reservation',
+    'user.edit_profile POST', 'user.change_password POST', 'admin.create_parking_lot POST',
+    'admin.edit_parking_lot POST', 'admin.delete_spot', 'admin.delete_parking_lot',
+]
+
+@pytest.fixture(scope='module')
+def runs(make_app):
+    return {name: query_budget_run(make_app(), dataset) for name, dataset in QUERY_BUDGET_DATASETS}
+
+def test_every_route_is_budgeted(runs):
+    for run in runs.values():
+        assert sorted(run) == sorted(ROUTES)
+
+@pytest.mark.parametrize('route', ROUTES)
+def test_statement_count_does_not_grow_with_the_data(runs, route):
+    (small_name, small), (large_name, large) = runs.items()
+    assert not small[route][1] and not large[route][1], f'{route} returned an unexpected status'
+    regressions = list(query_budget_regressions({route: small[route]}, {route: large[route]}))
+    if regressions:
+        _, small_count, large_count, offending = regressions[0]
+        details = '\n'.join(f"  +{extra} {origin}: {' '.join(statement.split())[:160]}"
+                            for extra, statement, origin in offending)
+        pytest.fail(f'{route}: {small_count} statements with the {small_name} dataset, '
+                    f'{large_count} with the {large_name} one\n{details}', pytrace=False)
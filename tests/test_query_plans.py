@@ -0,0 +1,86 @@
+"""Every statement the hot routes issue must reach reservation and parking_spot through an index.
+
+The statements are captured from real requests against a seeded database and re-run under
+EXPLAIN QUERY PLAN with their original parameters.
+"""
+import re
+from datetime import datetime
+import pytest
+from sqlalchemy import event
+from models import db, ParkingLot, Reservation
+from synthetic_data import generate
+
+PASSWORD = 'password123'
+# "SCAN reservation" reads every row; "SCAN reservation USING [COVERING] INDEX ..." does not
+FULL_SCAN = re.compile(r'^SCAN (reservation|parking_spot)\b(?!.* USING (COVERING )?INDEX )')
+
+ROUTES = [
+    ('user', 'GET', '/user/dashboard'),
+    ('user', 'GET', '/user/book_spot/{lot_id}'),
+    ('user', 'POST', '/user/book_spot/{lot_id}'),
+    ('admin', 'GET', '/admin/dashboard'),
+    ('admin', 'GET', '/admin/user_details/{user_id}'),
+    ('admin', 'GET', '/admin/view_spot_details/{spot_id}'),
+]
+
+@pytest.fixture(scope='module')
+def seeded(make_app, login):
+    app = make_app()
+    with app.app_context():
+        generate(lots=4, users=10, reservations=300, min_capacity=5, max_capacity=20,
+                 password=PASSWORD, end=datetime(2026, 1, 1))
+        db.session.commit()
+        ids = {
+            'lot_id': ParkingLot.query.order_by(ParkingLot.id).first().id,
+            'user_id': 2,
+            'spot_id': db.session.query(Reservation.spot_id).filter(Reservation.spot_id.isnot(None)).first()[0],
+        }
+    clients = {'user': login(app, 'synth_user000001', PASSWORD), 'admin': login(app, 'synth_admin', PASSWORD)}
+    return app, clients, ids
+
+def captured_plans(app, client, method, path, data=None):
+    """[(statement, plan detail lines)] for the SELECT/UPDATE/DELETE statements of one request."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')):
+            statements.append((statement, parameters))
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', capture)
+    try:
+        response = client.open(path, method=method, data=data)
+    finally:
+        event.remove(engine, 'before_cursor_execute', capture)
+    assert response.status_code in (200, 302)
+
+    with engine.connect() as conn:
+        return [(statement, [row[3] for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)])
+                for statement, parameters in statements]
+
+@pytest.mark.parametrize('role, method, path', ROUTES, ids=[f'{method} {path}' for _, method, path in ROUTES])
+def test_route_queries_use_indexes(seeded, role, method, path):
+    app, clients, ids = seeded
+    data = {'vehicle_number': 'PLAN0001'} if method == 'POST' else None
+    plans = captured_plans(app, clients[role], method, path.format(**ids), data)
+    assert plans
+    full_scans = [(' '.join(statement.split()), line)
+                  for statement, plan in plans for line in plan if FULL_SCAN.match(line)]
+    assert not full_scans
+
+def test_vehicle_number_check_uses_partial_index(seeded):
+    app, clients, ids = seeded
+    plans = captured_plans(app, clients['user'], 'POST', f"/user/book_spot/{ids['lot_id']}",
+                           {'vehicle_number': 'PLAN0002'})
+    vehicle_plans = [plan for statement, plan in plans if 'reservation.vehicle_number =' in statement]
+    assert vehicle_plans
+    for plan in vehicle_plans:
+        assert any('ix_reservation_open_vehicle' in line for line in plan), plan
+
+def test_full_scan_pattern():
+    assert FULL_SCAN.match('SCAN reservation')
+    assert FULL_SCAN.match('SCAN parking_spot')
+    assert not FULL_SCAN.match('SCAN reservation USING COVERING INDEX ix_reservation_status')
+    assert not FULL_SCAN.match('SEARCH reservation USING INDEX ix_reservation_user_booking (user_id=?)')
+    assert not FULL_SCAN.match('SCAN reservation_fts')
@@ -0,0 +1,80 @@
+import threading
+from datetime import datetime
+from models import db, ParkingLot, ParkingSpot, Reservation, User
+
+SPOTS = 6
+BOOKERS = 24
+
+def make_lot(app, spots):
+    with app.app_context():
+        lot = ParkingLot(name='Race Lot', address='Race Road', pin_code='560001', price_per_hour=10.0,
+                         maximum_capacity=spots, available_spots=spots)
+        db.session.add(lot)
+        db.session.add_all(User(username=f'booker{i}', full_name=f'Booker {i}', email=f'booker{i}@example.com',
+                                password_hash='!') for i in range(BOOKERS))
+        db.session.flush()
+        ParkingSpot.bulk_create(lot.id, 1, spots)
+        db.session.commit()
+        return lot.id, [user.id for user in User.query.filter(User.username.like('booker%'))]
+
+def book(app, lot_id, user_id, start, results):
+    """What user.book_spot does on POST: claim a spot, record the reservation, move the counters."""
+    start.wait()
+    with app.app_context():
+        spot = ParkingSpot.claim_next_available(lot_id)
+        if spot is None:
+            db.session.rollback()
+            results.append(None)
+            return
+        db.session.add(Reservation(user_id=user_id, spot_id=spot.id, vehicle_number=f'RACE{user_id:04d}',
+                                   booking_timestamp=datetime.utcnow(), status='pending'))
+        db.session.get(ParkingLot, lot_id).adjust_spot_counts('Available', 'Reserved')
+        db.session.commit()
+        results.append(spot.id)
+
+def test_concurrent_bookers_never_share_a_spot(app):
+    lot_id, user_ids = make_lot(app, SPOTS)
+    results = []
+    start = threading.Barrier(BOOKERS)
+    threads = [threading.Thread(target=book, args=(app, lot_id, user_id, start, results)) for user_id in user_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    booked = [spot_id for spot_id in results if spot_id is not None]
+    assert len(results) == BOOKERS
+    assert len(booked) == SPOTS
+    assert len(set(booked)) == len(booked)
+
+    with app.app_context():
+        lot = db.session.get(ParkingLot, lot_id)
+        assert (lot.available_spots, lot.reserved_spots, lot.occupied_spots) == (0, SPOTS, 0)
+        assert ParkingSpot.query.filter_by(lot_id=lot_id, status='Reserved').count() == SPOTS
+        reserved = {reservation.spot_id for reservation in Reservation.query.filter_by(status='pending')}
+        assert reserved == set(booked)
+
+def test_claim_returns_none_when_full(app):
+    lot_id, user_ids = make_lot(app, 1)
+    with app.app_context():
+        assert ParkingSpot.claim_next_available(lot_id) is not None
+        assert ParkingSpot.claim_next_available(lot_id) is None
+
+def test_bulk_delete_free_spares_claimed_spots_and_detaches_history(app):
+    spots = ParkingSpot.DELETE_BATCH_SIZE + 100  # more than one batch
+    lot_id, user_ids = make_lot(app, spots)
+    with app.app_context():
+        highest = ParkingSpot.query.filter_by(lot_id=lot_id).order_by(ParkingSpot.spot_index.desc())
+        claimed, history = highest[0], highest[1]
+        claimed.status = 'Reserved'
+        db.session.add_all([
+            Reservation(user_id=user_ids[0], spot_id=claimed.id, vehicle_number='OPEN0001', status='pending'),
+            Reservation(user_id=user_ids[1], spot_id=history.id, vehicle_number='PAST0001', status='completed'),
+        ])
+        db.session.commit()
+
+        assert ParkingSpot.bulk_delete_free(lot_id, spots) == spots - 1
+        db.session.commit()
+        assert [spot.id for spot in ParkingSpot.query.filter_by(lot_id=lot_id)] == [claimed.id]
+        assert Reservation.query.filter_by(vehicle_number='PAST0001').one().spot_id is None
+        assert Reservation.query.filter_by(vehicle_number='OPEN0001').one().spot_id == claimed.id
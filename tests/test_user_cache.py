@@ -0,0 +1,56 @@
+from sqlalchemy import event
+from models import db, User
+
+def test_profile_change_reaches_other_workers(make_app, login):
+    # two apps on one database, each with its own in-process cache, stand in for two workers
+    first = make_app()
+    # the reader re-reads user versions on every request instead of every few seconds
+    second = make_app(SQLALCHEMY_DATABASE_URI=first.config['SQLALCHEMY_DATABASE_URI'], USER_VERSION_CHECK_SECONDS=0)
+    with first.app_context():
+        user = User(username='driver', full_name='Driver', email='driver@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+
+    editor = login(first, 'driver', 'password123')
+    reader = login(second, 'driver', 'password123')
+    assert b'value="driver"' in reader.get('/user/edit_profile').data
+
+    response = editor.post('/user/edit_profile', data={'username': 'renamed', 'email': 'driver@example.com',
+                                                       'full_name': 'Driver'})
+    assert response.status_code == 302
+    page = reader.get('/user/edit_profile').data
+    assert b'value="renamed"' in page and b'value="driver"' not in page
+
+def test_warm_request_runs_no_sql(app, login):
+    with app.app_context():
+        user = User(username='driver', full_name='Driver', email='driver@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+    client = login(app, 'driver', 'password123')
+    client.get('/user/edit_profile')
+
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        client.get('/user/edit_profile')
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    assert statements == []
+
+def test_own_edit_shows_on_the_next_request(app, login):
+    with app.app_context():
+        user = User(username='driver', full_name='Driver', email='driver@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+    client = login(app, 'driver', 'password123')
+    assert b'value="driver"' in client.get('/user/edit_profile').data
+
+    client.post('/user/edit_profile', data={'username': 'renamed', 'email': 'driver@example.com',
+                                            'full_name': 'Driver'})
+    assert b'value="renamed"' in client.get('/user/edit_profile').data
@@ -0,0 +1,61 @@
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+from cache import get_cache, LRUCache, NullCache, DEFAULT_MAX_ENTRIES
+from models import db, User, CacheVersion
+
+DEFAULT_USER_CACHE_TTL = 60
+DEFAULT_USER_VERSION_CHECK_SECONDS = 2
+# password_hash stays out of the cache; it is loaded on first access, i.e. only by password checks
+CACHED_FIELDS = ('id', 'username', 'full_name', 'email', 'is_admin')
+
+def _version_name(user_id):
+    return f'user:{user_id}'
+
+def _key(user_id, version):
+    return f'user:{user_id}:{version}'
+
+def make_user_versions(config):
+    """Per-process memo of the users' CacheVersions, each trusted for USER_VERSION_CHECK_SECONDS
+    (0: read the version on every request)."""
+    seconds = config.get('USER_VERSION_CHECK_SECONDS', DEFAULT_USER_VERSION_CHECK_SECONDS)
+    return LRUCache(config.get('CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES), seconds) if seconds else NullCache()
+
+def _version(user_id):
+    versions = current_app.extensions['user_versions']
+    version = versions.get(user_id)
+    if version is None:
+        version = CacheVersion.current(_version_name(user_id))
+        versions.set(user_id, version)
+    return version
+
+def load_cached_user(user_id):
+    """The logged-in user for Flask-Login, from the app cache when possible.
+
+    A cached user is merged back into the session without a SELECT, so it behaves like a
+    queried one (relationships and edits work); only its password hash is fetched lazily.
+    Entries are keyed by the user's `user:<id>` CacheVersion, which each worker re-reads at
+    most every USER_VERSION_CHECK_SECONDS, so a hit runs no SQL at all. An invalidate_user()
+    shows in its own worker at once and in the others within that interval; entries also
+    expire after USER_CACHE_TTL seconds.
+    """
+    # version first: a change committed before the user is loaded only makes the entry newer
+    key = _key(user_id, _version(user_id))
+    data = get_cache().get(key)
+    if data is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        get_cache().set(key, {field: getattr(user, field) for field in CACHED_FIELDS},
+                        ttl=current_app.config.get('USER_CACHE_TTL', DEFAULT_USER_CACHE_TTL))
+        return user
+    user = User(**data)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+def invalidate_user(user_id):
+    """Call in the same transaction as any change to a user's profile, password or role."""
+    CacheVersion.bump(_version_name(user_id))
+    versions = current_app.extensions['user_versions']
+    # this worker forgets the version once the bump is committed, so its next request sees it
+    event.listen(db.session(), 'after_commit', lambda session: versions.delete(user_id), once=True)
@@ -0,0 +1,7 @@
+"""The application for `flask` commands and WSGI servers, e.g. `gunicorn wsgi:app`."""
+from app import create_app
+
+app = create_app()
+
+if __name__ == '__main__':
+    app.run(debug=True)